@@ -0,0 +1,64 @@
+from sqlalchemy.orm.session import Session
+
+from api import schemas
+from api.crud import CampaignAssignmentCrud, CampaignCrud, ProspectCrud
+from api.models import CampaignAssignment, Prospect
+from .config import settings
+from .constants import CAMPAIGN_LINK_BATCH_SIZE
+from .exceptions import AssignmentLeaseLost
+
+
+def assignment_progress(assignment: CampaignAssignment) -> dict:
+    """Progress of a campaign assignment, as reported to clients"""
+    return {
+        "assignment_id": assignment.id,
+        "status": assignment.status,
+        "campaign_ids": assignment.campaign_ids,
+        "total": assignment.total_rows,
+        "done": assignment.processed_rows,
+        "added": assignment.added_rows,
+    }
+
+
+def assign_prospects(db: Session, assignment: CampaignAssignment, worker_id: str):
+    """Add the prospects matching a claimed assignment's selector to its
+    campaigns, entirely in the database.
+
+    The matching prospects are walked by id in batches of
+    CAMPAIGN_LINK_BATCH_SIZE; every batch is an INSERT ... SELECT per campaign
+    over its id range, committed together with the counters and a checkpoint,
+    so an interrupted assignment resumes after its last batch.
+    """
+    user_id = assignment.user_id
+    filters = schemas.ProspectSearch.parse_obj(assignment.selector)
+    if assignment.total_rows is None:
+        CampaignAssignmentCrud.set_total(
+            db, assignment.id, ProspectCrud.count_matching(db, user_id, filters)
+        )
+    criteria = ProspectCrud.search_criteria(user_id, filters)
+    after_id = assignment.checkpoint_prospect_id
+    while True:
+        count, last_id = ProspectCrud.next_batch_bounds(
+            db, user_id, filters, after_id, CAMPAIGN_LINK_BATCH_SIZE
+        )
+        if not count:
+            break
+        batch = [*criteria, Prospect.id > after_id, Prospect.id <= last_id]
+        added = sum(
+            len(CampaignCrud.link_prospects(db, campaign_id, user_id, batch))
+            for campaign_id in assignment.campaign_ids
+        )
+        if not CampaignAssignmentCrud.save_progress(
+            db,
+            assignment.id,
+            worker_id,
+            settings.IMPORT_LEASE_SECONDS,
+            counters={"processed_rows": count, "added_rows": added},
+            checkpoint={"checkpoint_prospect_id": last_id},
+        ):
+            raise AssignmentLeaseLost(assignment.id)
+        after_id = last_id
+    if not CampaignAssignmentCrud.update_state(
+        db, assignment.id, "finished", worker_id
+    ):
+        raise AssignmentLeaseLost(assignment.id)
@@ -0,0 +1,72 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # Optional, only for a shared cache
+    redis = None
+
+
+class CacheBackend(ABC):
+    """Storage of a cache: the in-process one of each API process, or one
+    shared by all of them. Entries may be evicted before they expire.
+    """
+
+    # Whether calls wait on the network, and so must stay off the event loop
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """The value of an entry, None if missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        """Store an entry for [ttl] seconds"""
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Bounded LRU cache in the memory of the process, with expiring entries"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache shared by the API processes of a deployment, in Redis"""
+
+    blocking = True
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("A Redis cache needs the redis package installed")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._client.set(key, value, px=max(1, int(ttl * 1000)))
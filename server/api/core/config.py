@@ -1,3 +1,5 @@
+from typing import Optional
+
 from dotenv import dotenv_values
 from pydantic import BaseSettings
 
@@ -11,6 +13,66 @@ class Settings(BaseSettings):
 
     PROJECT_NAME: str = "Sales Automation"
 
+    # Database, and the connection pools of its sync and async engines (one of
+    # each per process): connections kept open, extra connections opened under
+    # load, seconds to wait for a connection before failing, seconds after
+    # which a connection is replaced, and a liveness check on every checkout
+    DATABASE_URL: Optional[str] = config.get("DATABASE_URL")
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Size of the reads used to stream uploaded files to disk
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+
+    # Import worker (see worker.py)
+    IMPORT_WORKERS: int = 4
+    IMPORT_POLL_INTERVAL: float = 1.0
+    IMPORT_LEASE_SECONDS: int = 300
+    IMPORT_MAX_ATTEMPTS: int = 3
+    # Processes importing the byte ranges of a single file in parallel mode
+    IMPORT_RANGE_PROCESSES: int = 4
+
+    # Import progress streaming
+    PROGRESS_POLL_INTERVAL: float = 1.0
+    PROGRESS_KEEPALIVE_SECONDS: float = 15.0
+
+    # Listing totals: "maintained" reads the per-user counters, "exact" counts
+    # rows, "estimated" leaves the counters alone and uses the Postgres planner
+    # estimate for totals of at least TOTALS_ESTIMATE_MIN rows
+    TOTALS_MODE: str = "maintained"
+    TOTALS_ESTIMATE_MIN: int = 1_000_000
+    # Seconds between two repairs of drifted counters by the import worker
+    TOTALS_RECONCILE_INTERVAL: float = 3600.0
+
+    # Campaign name search: default and maximum number of results, minimum
+    # trigram word similarity of a match, and number of users whose in-process
+    # index is kept when the database has no pg_trgm
+    CAMPAIGN_SEARCH_LIMIT: int = 10
+    CAMPAIGN_SEARCH_MAX_LIMIT: int = 50
+    CAMPAIGN_SEARCH_SIMILARITY: float = 0.5
+    CAMPAIGN_SEARCH_INDEX_USERS: int = 100
+
+    # Prospect export: size of the chunks written to the response, and gzip
+    # compression level
+    EXPORT_CHUNK_SIZE: int = 64 * 1024
+    EXPORT_GZIP_LEVEL: int = 6
+
+    # Users of recently seen tokens, cached for at most USER_CACHE_TTL seconds
+    # in each API process, or in Redis when USER_CACHE_REDIS_URL is set
+    USER_CACHE_TTL: float = 60.0
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_REDIS_URL: Optional[str] = None
+
+    # Password hashing: bcrypt cost (existing hashes are upgraded or downgraded
+    # on the next login), threads hashing off the event loop, and number of
+    # queued or running hashes beyond which logins are refused
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
     class Config:
         case_sensitive = True
 
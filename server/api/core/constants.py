@@ -4,3 +4,20 @@ DEFAULT_PAGE_SIZE = 10
 MIN_PAGE_SIZE = 1
 MAX_PAGE_SIZE = 100
 MAX_PROSPECTS_SIZE = 1000
+STREAM_BATCH_SIZE = 10000
+CAMPAIGN_LINK_BATCH_SIZE = 10000
+# Bound parameters allowed in a single statement by SQLite before 3.32
+SQLITE_MAX_VARIABLES = 999
+EXPORT_COLUMNS = (
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "file_id",
+    "created_at",
+    "updated_at",
+)
+# Upper bounds (seconds) of the buckets of the connection pool wait histogram
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+# Lifetime of the user cache generations, in USER_CACHE_TTL units
+USER_CACHE_GENERATION_TTL_FACTOR = 10
@@ -0,0 +1,76 @@
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+from typing import Iterable, Optional, Set, Tuple
+
+from sqlalchemy.orm.session import Session
+
+from api.crud import ProspectCrud
+
+
+def email_hash(email: str) -> int:
+    """Signed 64-bit hash of an email"""
+    return int.from_bytes(
+        blake2b(email.encode(), digest_size=8).digest(), "little", signed=True
+    )
+
+
+class EmailIndex:
+    """The emails a user's prospects already have, kept as 64-bit hashes for the
+    duration of an import so rows can be classified as new or existing without
+    querying the database for every chunk.
+
+    Emails of other sources are in a sorted array (8 bytes each), emails written
+    by this import in a set. A hash collision could make a new email look
+    existing; with n known emails the odds for any given row are n / 2^64.
+    """
+
+    def __init__(
+        self, known: array, imported: Set[int], rewritten: Optional[Set[int]] = None
+    ):
+        self._known = known
+        self._imported = imported
+        # Emails an earlier attempt of an import starting over already wrote
+        self._rewritten = rewritten or set()
+
+    @classmethod
+    def build(
+        cls, db: Session, user_id: int, file_id: int, restart: bool = False
+    ) -> "EmailIndex":
+        """Index the user's emails with a single streamed query. Prospects that
+        came from the file itself count as imported (a resumed import), or as
+        rewritten with [restart] (an import starting over with reset counters).
+        """
+        known = []
+        from_file = set()
+        for email, is_from_file in ProspectCrud.iter_user_emails(db, user_id, file_id):
+            (from_file.add if is_from_file else known.append)(email_hash(email))
+        known.sort()
+        if restart:
+            return cls(array("q", known), set(), from_file)
+        return cls(array("q", known), from_file)
+
+    def _is_known(self, hashed: int) -> bool:
+        i = bisect_left(self._known, hashed)
+        return i < len(self._known) and self._known[i] == hashed
+
+    def classify(self, emails: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+        """Split emails in (existing from other sources, already imported)"""
+        known, imported = set(), set()
+        for email in emails:
+            hashed = email_hash(email)
+            if hashed in self._imported or hashed in self._rewritten:
+                imported.add(email)
+            elif self._is_known(hashed):
+                known.add(email)
+        return known, imported
+
+    def take_rewritten(self, emails: Iterable[str]) -> int:
+        """Count the emails that an earlier attempt wrote, once each"""
+        hashes = {email_hash(email) for email in emails} & self._rewritten
+        self._rewritten -= hashes
+        return len(hashes)
+
+    def add(self, emails: Iterable[str]):
+        """Record emails written by this import"""
+        self._imported.update(email_hash(email) for email in emails)
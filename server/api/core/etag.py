@@ -0,0 +1,42 @@
+import hashlib
+from typing import Optional
+
+import orjson
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Clients may keep a copy, but have to check it is current before using it
+CACHE_CONTROL = "private, no-cache"
+
+
+def version_etag(user_id: int, data_version: int) -> str:
+    """ETag of the representations of a user's data at a data_version"""
+    return f'W/"{user_id}.{data_version}"'
+
+
+def content_etag(content) -> str:
+    """ETag of a JSON serializable response content"""
+    digest = hashlib.blake2b(orjson.dumps(content), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 Not Modified response if the client's copy (If-None-Match) has
+    the current etag, else None
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    # Weak comparison: the W/ prefix is ignored
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        return Response(
+            status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        )
+    return None
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
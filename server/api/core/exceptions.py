@@ -5,3 +5,30 @@ CredentialsException = HTTPException(
     detail="Could not validate credentials",
     headers={"WWW-Authenticate": "Bearer"},
 )
+
+PasswordHashingBusyException = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many logins at the moment, please retry",
+    headers={"Retry-After": "1"},
+)
+
+InvalidCursorException = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Invalid cursor",
+)
+
+
+class PasswordHashingBusy(Exception):
+    """Too many password hashes queued already"""
+
+
+class ImportLeaseLost(Exception):
+    """The worker's claim on an import expired and was taken over"""
+
+
+class InvalidUpload(Exception):
+    """The uploaded file can't be read as (possibly compressed) CSV"""
+
+
+class AssignmentLeaseLost(Exception):
+    """The worker's claim on a campaign assignment expired and was taken over"""
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from api.crud import ProspectCrud
+from api.database import SessionLocal
+from api import schemas
+from .config import settings
+from .constants import EXPORT_COLUMNS
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def _text(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    """CSV of the rows, header first, in chunks of about EXPORT_CHUNK_SIZE"""
+    buffer = io.StringIO()
+    csv_writer = csv.writer(buffer)
+    csv_writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        csv_writer.writerow([_text(value) for value in row])
+        if buffer.tell() >= settings.EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    """One JSON object per row, in chunks of about EXPORT_CHUNK_SIZE"""
+    chunk, size = [], 0
+    for row in rows:
+        line = json.dumps(dict(zip(EXPORT_COLUMNS, map(_text, row)))) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= settings.EXPORT_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    yield "".join(chunk)
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a stream of chunks into a single gzip member"""
+    compressor = zlib.compressobj(settings.EXPORT_GZIP_LEVEL, wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_prospects(
+    user_id: int, filters: schemas.ProspectSearch, format: str, gzip: bool
+) -> Iterator[bytes]:
+    """Body of a prospects export. Rows are read through a server-side cursor,
+    in a session of its own that lives as long as the response is streamed.
+    """
+    db = SessionLocal()
+    try:
+        rows = ProspectCrud.iter_export_rows(db, user_id, filters)
+        lines = csv_lines(rows) if format == "csv" else ndjson_lines(rows)
+        chunks = (text.encode() for text in lines)
+        yield from gzip_chunks(chunks) if gzip else chunks
+    finally:
+        db.close()
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from .config import settings
+from .exceptions import PasswordHashingBusy
+
+T = TypeVar("T")
+
+
+class HashingExecutor:
+    """Bounded pool of threads for password hashing and verification (bcrypt
+    releases the GIL), keeping that CPU work off the event loop. Calls beyond
+    [max_pending] queued or running ones are refused rather than queued.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="password")
+        self._lock = threading.Lock()
+        # Only changed from the event loop
+        self.pending = 0
+        self.rejected = 0
+        # Changed from the pool threads
+        self.running = 0
+        self.completed = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHashingBusy
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._call, time.monotonic(), fn, *args
+            )
+        finally:
+            self.pending -= 1
+
+    def _call(self, queued_at: float, fn: Callable[..., T], *args) -> T:
+        waited = time.monotonic() - queued_at
+        with self._lock:
+            self.running += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queued": self.pending - self.running,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+password_hasher = HashingExecutor(
+    settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING
+)
@@ -0,0 +1,186 @@
+import base64
+import json
+from typing import NamedTuple, Optional, Sequence, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.expression import tuple_
+
+from .exceptions import InvalidCursorException
+
+
+class Cursor(NamedTuple):
+    """Position in a keyset paginated listing: the sort key of the row to
+    continue after (forward) or before (backward)
+    """
+
+    forward: bool
+    key: list
+
+
+class Page(NamedTuple):
+    """One page of a listing, with the opaque cursors of its neighbours"""
+
+    items: list
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def encode_cursor(forward: bool, key: list) -> str:
+    payload = json.dumps([1 if forward else 0, key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Parse a cursor made by encode_cursor"""
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        forward, key = json.loads(payload)
+    except (TypeError, ValueError):
+        raise InvalidCursorException
+    # Sort keys are made of integer columns
+    if (
+        forward not in (0, 1)
+        or not isinstance(key, list)
+        or not all(type(value) is int for value in key)
+    ):
+        raise InvalidCursorException
+    return Cursor(bool(forward), key)
+
+
+def _row_key(row, order_by: Sequence) -> list:
+    return [getattr(row, column.key) for column in order_by]
+
+
+def keyset_page(
+    query: Query,
+    order_by: Sequence,
+    cursor: Optional[Cursor],
+    page_size: int,
+    descending: bool = False,
+) -> Page:
+    """Fetch the page of [query] that follows (or precedes) the cursor, ordered
+    by the [order_by] columns, which must make a unique key. Each page costs
+    the same whatever its depth, provided an index covers the sort key.
+    """
+    query = _keyset_statement(query, order_by, cursor, page_size, descending)
+    return _keyset_result(query.all(), order_by, cursor, page_size)
+
+
+async def keyset_page_async(
+    db: AsyncSession,
+    statement: Select,
+    order_by: Sequence,
+    cursor: Optional[Cursor],
+    page_size: int,
+    descending: bool = False,
+) -> Page:
+    """keyset_page of a select() statement, on an async session"""
+    statement = _keyset_statement(statement, order_by, cursor, page_size, descending)
+    rows = (await db.execute(statement)).all()
+    return _keyset_result(rows, order_by, cursor, page_size)
+
+
+def _keyset_statement(
+    statement: Union[Query, Select],
+    order_by: Sequence,
+    cursor: Optional[Cursor],
+    page_size: int,
+    descending: bool,
+) -> Union[Query, Select]:
+    forward = cursor is None or cursor.forward
+    # Walking backwards scans the index in the opposite direction
+    scan_descending = descending == forward
+    sort_key = order_by[0] if len(order_by) == 1 else tuple_(*order_by)
+    if cursor is not None:
+        if len(cursor.key) != len(order_by):
+            # A cursor of another listing or sort order
+            raise InvalidCursorException
+        key = cursor.key[0] if len(order_by) == 1 else tuple_(*cursor.key)
+        statement = statement.filter(
+            sort_key < key if scan_descending else sort_key > key
+        )
+    return statement.order_by(
+        *(column.desc() if scan_descending else column for column in order_by)
+    ).limit(page_size + 1)
+
+
+def _keyset_result(
+    rows: list, order_by: Sequence, cursor: Optional[Cursor], page_size: int
+) -> Page:
+    forward = cursor is None or cursor.forward
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forward:
+        rows.reverse()
+    if not rows:
+        return Page(rows, None, None)
+    first, last = _row_key(rows[0], order_by), _row_key(rows[-1], order_by)
+    if forward:
+        return Page(
+            rows,
+            encode_cursor(True, last) if has_more else None,
+            encode_cursor(False, first) if cursor is not None else None,
+        )
+    return Page(
+        rows,
+        encode_cursor(True, last),
+        encode_cursor(False, first) if has_more else None,
+    )
+
+
+def offset_page(
+    query: Query,
+    order_by: Sequence,
+    page: int,
+    page_size: int,
+    descending: bool = False,
+) -> Page:
+    """Legacy page number based pagination, with the same cursors as
+    keyset_page so clients can switch over from any page
+    """
+    query = _offset_statement(query, order_by, page, page_size, descending)
+    return _offset_result(query.all(), order_by, page, page_size)
+
+
+async def offset_page_async(
+    db: AsyncSession,
+    statement: Select,
+    order_by: Sequence,
+    page: int,
+    page_size: int,
+    descending: bool = False,
+) -> Page:
+    """offset_page of a select() statement, on an async session"""
+    statement = _offset_statement(statement, order_by, page, page_size, descending)
+    rows = (await db.execute(statement)).all()
+    return _offset_result(rows, order_by, page, page_size)
+
+
+def _offset_statement(
+    statement: Union[Query, Select],
+    order_by: Sequence,
+    page: int,
+    page_size: int,
+    descending: bool,
+) -> Union[Query, Select]:
+    return (
+        statement.order_by(
+            *(column.desc() if descending else column for column in order_by)
+        )
+        .offset(page * page_size)
+        .limit(page_size + 1)
+    )
+
+
+def _offset_result(rows: list, order_by: Sequence, page: int, page_size: int) -> Page:
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not rows:
+        return Page(rows, None, None)
+    return Page(
+        rows,
+        encode_cursor(True, _row_key(rows[-1], order_by)) if has_more else None,
+        encode_cursor(False, _row_key(rows[0], order_by)) if page > 0 else None,
+    )
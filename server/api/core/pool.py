@@ -0,0 +1,110 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Sequence
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .constants import POOL_WAIT_BUCKETS
+
+
+class PoolMetrics:
+    """Counters of the checkouts of a connection pool"""
+
+    def __init__(self, buckets: Sequence[float] = POOL_WAIT_BUCKETS):
+        self.buckets = buckets
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_events = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # Checkouts by wait time, the last bucket takes the longer waits
+        self.wait_counts = [0] * (len(buckets) + 1)
+        self._lock = Lock()
+
+    def record_checkout(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            self.wait_counts[bisect_left(self.buckets, wait)] += 1
+
+    def record_overflow(self):
+        with self._lock:
+            self.overflow_events += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            # Cumulative counts of waits up to each bound, like a Prometheus
+            # histogram
+            histogram, count = {}, 0
+            for bound, bucket_count in zip(
+                [*map(str, self.buckets), "+Inf"], self.wait_counts
+            ):
+                count += bucket_count
+                histogram[bound] = count
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "overflow_events": self.overflow_events,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_histogram": histogram,
+            }
+
+
+class InstrumentedPoolMixin:
+    """Times every connection checkout of a QueuePool (including the ones that
+    time out) and counts the overflow connections it opens
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_checkout(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+    def _inc_overflow(self):
+        opened = super()._inc_overflow()
+        # Connections beyond pool_size are overflow
+        if opened and self._overflow > 0:
+            self.metrics.record_overflow()
+        return opened
+
+    def recreate(self):
+        # engine.dispose() replaces the pool, the counters carry over
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def stats(self) -> dict:
+        """Live state of the pool, and its checkout counters"""
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout": self.timeout(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            **self.metrics.stats(),
+        }
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
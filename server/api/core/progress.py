@@ -0,0 +1,115 @@
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, Set, Union
+
+from fastapi.concurrency import run_in_threadpool
+
+from api.crud import ProspectsFileCrud
+from api.database import SessionLocal
+from api.models import ProspectsFile
+from .config import settings
+
+TERMINAL_STATUSES = ("finished", "failed")
+
+
+def file_progress(file: ProspectsFile) -> dict:
+    """Progress of an import, as reported to clients"""
+    return {
+        "file_id": file.id,
+        "status": file.status,
+        "total": file.total_rows,
+        "done": file.processed_rows,
+        "inserted": file.inserted_rows,
+        "updated": file.updated_rows,
+        "skipped": file.skipped_rows,
+        "rejected": file.rejected_rows,
+    }
+
+
+def read_progress(file_id: int) -> Union[dict, None]:
+    db = SessionLocal()
+    try:
+        file = ProspectsFileCrud.get_file_by_id(db, file_id)
+        return file_progress(file) if file else None
+    finally:
+        db.close()
+
+
+class ProgressBroker:
+    """In-process fan-out of import progress.
+
+    Imports run in the worker processes, so every watched file gets one
+    producer task here that polls its counters and publishes changes to all
+    the subscribers of that file: N watchers cost a single primary key read per
+    poll interval.
+    """
+
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._producers: Dict[int, asyncio.Task] = {}
+        self._latest: Dict[int, dict] = {}
+
+    @asynccontextmanager
+    async def subscribe(self, file_ids: Iterable[int]) -> AsyncIterator[asyncio.Queue]:
+        """Yield a queue receiving the progress events of the given files,
+        starting with their latest known state
+        """
+        file_ids = set(file_ids)
+        queue = asyncio.Queue()
+        for file_id in file_ids:
+            self._subscribers[file_id].add(queue)
+            if file_id in self._latest:
+                queue.put_nowait(self._latest[file_id])
+            if file_id not in self._producers:
+                self._producers[file_id] = asyncio.create_task(self._produce(file_id))
+        try:
+            yield queue
+        finally:
+            for file_id in file_ids:
+                subscribers = self._subscribers[file_id]
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[file_id]
+                    self._latest.pop(file_id, None)
+                    producer = self._producers.pop(file_id, None)
+                    if producer:
+                        producer.cancel()
+
+    def publish(self, file_id: int, event: dict):
+        self._latest[file_id] = event
+        for queue in self._subscribers.get(file_id, ()):
+            queue.put_nowait(event)
+
+    def abort(self, file_id: int, error: str):
+        """Send the subscribers of the file a terminal error event, which ends
+        their streams of that file
+        """
+        self._latest.pop(file_id, None)
+        for queue in self._subscribers.get(file_id, ()):
+            queue.put_nowait({"file_id": file_id, "error": error})
+
+    async def _produce(self, file_id: int):
+        try:
+            while True:
+                try:
+                    event = await run_in_threadpool(read_progress, file_id)
+                except Exception:
+                    # The database is out of reach: let the clients reconnect
+                    self.abort(file_id, "Progress unavailable")
+                    break
+                if event is None:
+                    self.abort(file_id, "File not found")
+                    break
+                if event != self._latest.get(file_id):
+                    self.publish(file_id, event)
+                if event["status"] in TERMINAL_STATUSES:
+                    break
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            if self._producers.get(file_id) is asyncio.current_task():
+                del self._producers[file_id]
+
+
+progress_broker = ProgressBroker(settings.PROGRESS_POLL_INTERVAL)
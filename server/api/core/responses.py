@@ -0,0 +1,27 @@
+from typing import Iterable, List
+
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.engine import Row
+
+from .pagination import Page
+
+
+def rows_content(rows: Iterable[Row]) -> List[dict]:
+    """Column tuples selected after a schema's fields, as that schema's JSON"""
+    return [row._asdict() for row in rows]
+
+
+def page_response(name: str, page: Page, **fields) -> ORJSONResponse:
+    """Response of a paginated listing, encoded straight from the column tuples
+    of the page. The rows come from the database and follow the endpoint's
+    response_model already, validating them again costs more than the query.
+    """
+    return ORJSONResponse(
+        {
+            name: rows_content(page.items),
+            "size": len(page.items),
+            **fields,
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor,
+        }
+    )
@@ -0,0 +1,127 @@
+import heapq
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from itertools import chain
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .config import settings
+
+WORD_RE = re.compile(r"[^\W_]+")
+# Escape character of the LIKE patterns made by escape_like
+LIKE_ESCAPE = "\\"
+
+
+def escape_like(value: str) -> str:
+    """Escape the LIKE wildcards of [value], to be matched with LIKE_ESCAPE"""
+    return re.sub(r"([\\%_])", r"\\\1", value)
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of the words of [text], extracted the way pg_trgm does"""
+    grams = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NgramIndex:
+    """In-process trigram index of one user's campaign names, for databases
+    without pg_trgm. Names are only ever added: campaigns are never renamed
+    or deleted.
+    """
+
+    def __init__(self):
+        self.names: Dict[int, str] = {}
+        self.sizes: Dict[int, int] = {}
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        # Campaigns with a greater id are not indexed yet
+        self.max_id = 0
+        self._lock = threading.Lock()
+
+    def load(self, rows: Iterable[Tuple[int, str]]):
+        """Index the campaigns with an id greater than max_id, read in id order"""
+        with self._lock:
+            for campaign_id, name in rows:
+                self._add(campaign_id, name)
+                self.max_id = max(self.max_id, campaign_id)
+
+    def add(self, campaign_id: int, name: str):
+        """Index a new campaign. Leaves max_id alone, campaigns created in other
+        processes meanwhile may have smaller ids.
+        """
+        with self._lock:
+            self._add(campaign_id, name)
+
+    def _add(self, campaign_id: int, name: str):
+        if campaign_id in self.names:
+            return
+        grams = trigrams(name)
+        self.names[campaign_id] = name.lower()
+        self.sizes[campaign_id] = len(grams)
+        for gram in grams:
+            self.postings[gram].add(campaign_id)
+
+    def search(self, fragment: str, limit: int, threshold: float) -> List[int]:
+        """Ids of the best [limit] matches: names starting with the fragment
+        first, then names containing it, then by word similarity (the share of
+        the fragment's trigrams found in the name, like pg_trgm's)
+        """
+        fragment = fragment.lower()
+        grams = trigrams(fragment)
+        with self._lock:
+            names = self.names
+            ranked = []
+            if len(fragment) < 3:
+                # Too short to tell similar names apart, or to share a trigram
+                # with all the names containing it
+                for campaign_id, name in names.items():
+                    if fragment in name:
+                        ranked.append(
+                            (name.startswith(fragment), True, 0, -campaign_id)
+                        )
+            else:
+                shared = Counter(
+                    chain.from_iterable(self.postings.get(gram, ()) for gram in grams)
+                )
+                # Shared trigrams ordered the same as the word similarity
+                needed = threshold * len(grams)
+                for campaign_id, count in shared.items():
+                    name = names[campaign_id]
+                    if fragment in name:
+                        ranked.append(
+                            (name.startswith(fragment), True, count, -campaign_id)
+                        )
+                    elif count >= needed:
+                        ranked.append((False, False, count, -campaign_id))
+        return [-key[3] for key in heapq.nlargest(limit, ranked)]
+
+
+class NgramIndexes:
+    """The NgramIndex of the most recently searched users"""
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._indexes: "OrderedDict[int, NgramIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> NgramIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = self._indexes[user_id] = NgramIndex()
+                if len(self._indexes) > self.max_users:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(user_id)
+            return index
+
+    def add(self, user_id: int, campaign_id: int, name: str):
+        """Index a new campaign, if its user's index is loaded"""
+        with self._lock:
+            index = self._indexes.get(user_id)
+        if index is not None:
+            index.add(campaign_id, name)
+
+
+campaign_name_indexes = NgramIndexes(settings.CAMPAIGN_SEARCH_INDEX_USERS)
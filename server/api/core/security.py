@@ -1,22 +1,31 @@
 from datetime import datetime, timedelta
 from typing import Any, Union, Optional
+from fastapi.concurrency import run_in_threadpool
 from jose import jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm.session import Session
 
 from .config import settings
+from .hashing import password_hasher
 from api import schemas
 from api.models import User
-from api.crud.user import UserCrud
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes of another cost are flagged for update by verify_and_update
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 
 ALGORITHM = "HS256"
 
 
 def create_access_token(data: dict) -> str:
-    """Create a JWT (access token) based on the provided data"""
-    encoded_jwt = jwt.encode(data, settings.SECRET_KEY, algorithm=ALGORITHM)
+    """Create a JWT (access token) based on the provided data, expiring after
+    ACCESS_TOKEN_EXPIRE_MINUTES
+    """
+    expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    encoded_jwt = jwt.encode(
+        {**data, "exp": expire}, settings.SECRET_KEY, algorithm=ALGORITHM
+    )
     return encoded_jwt
 
 
@@ -30,6 +39,11 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def hash_password(password: str) -> str:
+    """Hash a password in the password hashing pool"""
+    return await password_hasher.run(get_password_hash, password)
+
+
 def decode_token(token: str) -> schemas.Token:
     """Return a dictionary that represents the decoded JWT."""
     decoded = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
@@ -40,13 +54,24 @@ async def authenticate_user(
     db: Session, email: str, password: str
 ) -> Union[bool, User]:
     """Based on the provided email & password, verify that the credentials match
-    the records contained in the database.
+    the records contained in the database. The query runs in the threadpool and
+    the password check in the password hashing pool, the event loop is free
+    meanwhile. A password hashed with another cost than BCRYPT_ROUNDS is hashed
+    again.
     """
-    user = UserCrud.get_user_by_email(db, email)
+    # Imported here since UserCrud itself depends on this module
+    from api.crud.user import UserCrud
+
+    user = await run_in_threadpool(UserCrud.get_user_by_email, db, email)
     if not user:
         # No user with that email exists in the database
         return False
-    if not verify_password(password, user.password_digest):
+    valid, new_digest = await password_hasher.run(
+        pwd_context.verify_and_update, password, user.password_digest
+    )
+    if not valid:
         # The user exists but the password was incorrect
         return False
+    if new_digest:
+        await run_in_threadpool(UserCrud.set_password_digest, db, user, new_digest)
     return user
@@ -0,0 +1,190 @@
+import gzip
+import hashlib
+import io
+import os
+import zipfile
+import zlib
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from .exceptions import InvalidUpload
+
+try:
+    import zstandard
+except ImportError:  # .zst uploads are optional
+    zstandard = None
+
+# Compression of an upload, by file name suffix, and the suffix it is saved with
+COMPRESSIONS = {".gz": "gzip", ".zip": "zip", ".zst": "zstd"}
+SAVED_SUFFIXES = {None: ".csv", "gzip": ".csv.gz", "zip": ".zip", "zstd": ".csv.zst"}
+DECOMPRESSION_ERRORS = (OSError, EOFError, zipfile.BadZipFile, zlib.error) + (
+    (zstandard.ZstdError,) if zstandard else ()
+)
+
+
+class OffsetLines:
+    """Iterate over the decoded lines of a binary file, keeping track of the
+    byte offset right after the last line returned. csv.reader pulls exactly
+    the lines a record spans, so after each row [offset] is where the next
+    record starts.
+    """
+
+    def __init__(self, fobj: BinaryIO, encoding: str = "utf-8"):
+        self._fobj = fobj
+        self._encoding = encoding
+        self.offset = fobj.tell()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self._fobj.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode(self._encoding)
+
+
+class RecordCounter:
+    """Count CSV records incrementally, ignoring newlines inside quoted fields"""
+
+    def __init__(self):
+        self.records = 0
+        self._in_quotes = False
+        self._last_byte = b"\n"
+
+    def feed(self, chunk: bytes):
+        """Count the record terminators contained in the next chunk of bytes"""
+        if not chunk:
+            return
+        if not self._in_quotes and b'"' not in chunk:
+            # Fast path: no quoting involved, every newline ends a record
+            self.records += chunk.count(b"\n")
+        else:
+            # Every quote flips the state, so escaped quotes ("") cancel out
+            for i, part in enumerate(chunk.split(b'"')):
+                if i:
+                    self._in_quotes = not self._in_quotes
+                if not self._in_quotes:
+                    self.records += part.count(b"\n")
+        self._last_byte = chunk[-1:]
+
+    def total(self) -> int:
+        """Records seen so far, including a last record with no trailing newline"""
+        return self.records + (self._last_byte != b"\n")
+
+
+def compression_of(file_name: str) -> Optional[str]:
+    """The compression of a file (gzip, zip or zstd), judging by its name"""
+    return COMPRESSIONS.get(os.path.splitext(file_name.lower())[1])
+
+
+@contextmanager
+def open_records(path: str, offset: int = 0) -> Iterator[BinaryIO]:
+    """Open a saved upload at the [offset] of its CSV content, decompressing it
+    on the fly (nothing is inflated to disk or memory)
+    """
+    compression = compression_of(path)
+    if compression == "gzip":
+        with gzip.open(path, "rb") as read_obj:
+            read_obj.seek(offset)
+            yield read_obj
+    elif compression == "zip":
+        with zipfile.ZipFile(path) as archive:
+            members = [info for info in archive.infolist() if not info.is_dir()]
+            if len(members) != 1:
+                raise InvalidUpload("Zip archives must contain a single file")
+            with archive.open(members[0]) as read_obj:
+                read_obj.seek(offset)
+                yield read_obj
+    elif compression == "zstd":
+        if zstandard is None:
+            raise InvalidUpload("Zstandard compressed files are not supported")
+        with open(path, "rb") as raw_obj:
+            # Concatenated or streamed uploads hold several frames
+            reader = zstandard.ZstdDecompressor().stream_reader(
+                raw_obj, read_across_frames=True
+            )
+            # The buffered reader can't seek, the decompressing one can (forward)
+            reader.seek(offset)
+            yield io.BufferedReader(reader)
+    else:
+        with open(path, "rb") as read_obj:
+            read_obj.seek(offset)
+            yield read_obj
+
+
+def save_upload(source: BinaryIO, destination: str, chunk_size: int) -> Tuple[int, str]:
+    """Copy an uploaded file to disk in a single pass, counting CSV records and
+    hashing the content along the way. Returns (records, sha256 hex digest).
+
+    The records of compressed uploads are counted by streaming the saved file
+    through the decompressor once written.
+    """
+    compressed = compression_of(destination) is not None
+    counter = RecordCounter()
+    digest = hashlib.sha256()
+    with open(destination, "wb") as out_file:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            out_file.write(chunk)
+            digest.update(chunk)
+            if not compressed:
+                counter.feed(chunk)
+    if compressed:
+        try:
+            with open_records(destination) as read_obj:
+                for chunk in iter(lambda: read_obj.read(chunk_size), b""):
+                    counter.feed(chunk)
+        except DECOMPRESSION_ERRORS as e:
+            raise InvalidUpload(f"Could not decompress the uploaded file: {e}")
+    return counter.total(), digest.hexdigest()
+
+
+def split_records(
+    path: str, parts: int, start: int, chunk_size: int
+) -> List[Tuple[int, int]]:
+    """Split a CSV file, from the [start] offset on, into about [parts] byte
+    ranges that begin on record boundaries (newlines inside quoted fields are
+    not boundaries).
+
+    Returns the (offset, records before offset) pair of every range start,
+    followed by the pair for the end of the file.
+    """
+    size = os.path.getsize(path)
+    step = max((size - start) // parts, 1)
+    splits = [(start, 0)]
+    next_split = start + step
+    records = 0
+    in_quotes = False
+    last_byte = b"\n"
+    with open(path, "rb") as read_obj:
+        read_obj.seek(start)
+        position = start
+        for chunk in iter(lambda: read_obj.read(chunk_size), b""):
+            segment_start = position
+            for i, part in enumerate(chunk.split(b'"')):
+                if i:
+                    in_quotes = not in_quotes
+                    segment_start += 1
+                if not in_quotes:
+                    segment_end = segment_start + len(part)
+                    while len(splits) < parts and segment_end > next_split:
+                        newline = part.find(b"\n", max(next_split - segment_start, 0))
+                        if newline == -1:
+                            break
+                        offset = segment_start + newline + 1
+                        splits.append(
+                            (offset, records + part.count(b"\n", 0, newline + 1))
+                        )
+                        next_split = max(start + step * len(splits), offset)
+                    records += part.count(b"\n")
+                segment_start += len(part)
+            position += len(chunk)
+            last_byte = chunk[-1:]
+    records += last_byte != b"\n"
+    splits = [split for split in splits if split[0] < size]
+    splits.append((size, records))
+    return splits
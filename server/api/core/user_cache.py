@@ -0,0 +1,133 @@
+import hashlib
+import secrets
+import time
+from itertools import chain
+from typing import Callable, Optional
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, inspect
+from sqlalchemy.orm.session import Session
+
+from api import schemas
+from api.models import User
+from .cache import CacheBackend, MemoryCacheBackend, RedisCacheBackend
+from .config import settings
+from .constants import USER_CACHE_GENERATION_TTL_FACTOR
+
+
+class UserCache:
+    """Users of the recently seen tokens, so that authenticated requests skip
+    both the token signature check and the user query. Entries last until the
+    token expires, USER_CACHE_TTL at most, and are dropped when the user changes.
+
+    Entries carry the generation of their user, a random value replaced once
+    every change of the user commits. Generations are cache entries too, so they
+    may expire or be evicted; entries of a user without a generation are misses,
+    and a new generation never matches entries made before.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    async def run(self, method: Callable, *args):
+        """Call a method of the cache from the event loop, in the threadpool
+        when the backend does network round trips
+        """
+        if self.backend.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    def get(self, token: str) -> Optional[schemas.User]:
+        raw = self.backend.get(self._token_key(token))
+        if raw is None:
+            return None
+        entry = orjson.loads(raw)
+        if entry["exp"] is not None and entry["exp"] <= time.time():
+            # Expired: the token check rejects it
+            return None
+        user = schemas.User.parse_obj(entry["user"])
+        if entry["generation"] != self._generation(user.email):
+            return None
+        return user
+
+    def generation(self, email: str) -> str:
+        """The current generation of the user, to read before the user row: a
+        change committed in between then makes the entry stale at once
+        """
+        generation = self._generation(email)
+        if generation is None:
+            generation = self._new_generation(email)
+        return generation
+
+    def set(self, token: str, user: schemas.User, exp: Optional[int], generation: str):
+        ttl = self.ttl if exp is None else min(self.ttl, exp - time.time())
+        if ttl <= 0:
+            return
+        entry = {"user": user.dict(), "exp": exp, "generation": generation}
+        self.backend.set(self._token_key(token), orjson.dumps(entry), ttl)
+
+    def invalidate_user(self, email: str):
+        """Drop the cached entries of a user, in every process sharing the
+        backend
+        """
+        self._new_generation(email)
+
+    def _generation(self, email: str) -> Optional[str]:
+        raw = self.backend.get(self._generation_key(email))
+        return raw.decode() if raw is not None else None
+
+    def _new_generation(self, email: str) -> str:
+        generation = secrets.token_hex(8)
+        # Outlives the entries made with it, or they would turn into misses early
+        self.backend.set(
+            self._generation_key(email),
+            generation.encode(),
+            self.ttl * USER_CACHE_GENERATION_TTL_FACTOR,
+        )
+        return generation
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        # Tokens are credentials, only their hash is stored
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _generation_key(email: str) -> str:
+        # Keyed like the tokens' subject, known before the user is read
+        return f"user:{email}:generation"
+
+
+user_cache = UserCache(
+    (
+        RedisCacheBackend(settings.USER_CACHE_REDIS_URL)
+        if settings.USER_CACHE_REDIS_URL
+        else MemoryCacheBackend(settings.USER_CACHE_SIZE)
+    ),
+    settings.USER_CACHE_TTL,
+)
+
+
+@event.listens_for(Session, "after_flush")
+def collect_changed_users(session: Session, flush_context):
+    # Bulk updates (Query.update) skip this, they only touch the counters
+    emails = session.info.setdefault("changed_user_emails", set())
+    for user in chain(session.dirty, session.deleted):
+        if isinstance(user, User):
+            emails.add(user.email)
+            # Entries made under the former email of the user, if it changed
+            emails.update(inspect(user).attrs.email.history.deleted)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_changed_users(session: Session):
+    # Not at flush: a request reading the user before the commit would cache
+    # the old row under the new generation
+    for email in session.info.pop("changed_user_emails", ()):
+        user_cache.invalidate_user(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_changed_users(session: Session):
+    session.info.pop("changed_user_emails", None)
@@ -1,58 +1,290 @@
-from fastapi import Depends
-from pydantic import ValidationError
-from api import schemas
-from csv import reader
+import glob
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from csv import reader, writer
+from typing import BinaryIO, List, Optional, Tuple
 from sqlalchemy.orm.session import Session
 
 from api.crud import ProspectCrud, ProspectsFileCrud
-from api.dependencies.db import get_db
-from api.dependencies.auth import get_current_user
+from api.database import SessionLocal, init_process
+from api.models import ProspectsFile
+from .config import settings
 from .constants import MAX_PROSPECTS_SIZE
+from .email_index import EmailIndex
+from .exceptions import ImportLeaseLost
+from .uploads import OffsetLines, open_records, split_records
+from .validation import validate_rows
 
 
-def write_prospects(
+class RejectedRowsWriter:
+    """CSV of the rows that failed validation (row number, reason, original
+    columns), created on the first rejected row
+    """
+
+    def __init__(self, file_name: str, offset: int = 0):
+        self.file_name = file_name
+        self._obj = None
+        if offset:
+            # Drop rows written after the checkpoint, they are redone
+            self._obj = open(file_name, "r+", newline="")
+            self._obj.truncate(offset)
+            self._obj.seek(offset)
+
+    @property
+    def used(self) -> bool:
+        return self._obj is not None
+
+    def write(self, rejected: List[Tuple[int, str, List[str]]]):
+        if not rejected:
+            return
+        if self._obj is None:
+            self._obj = open(self.file_name, "w", newline="")
+        writer(self._obj).writerows(
+            [row_number, reason, *row] for row_number, reason, row in rejected
+        )
+        self._obj.flush()
+
+    def tell(self) -> int:
+        return self._obj.tell() if self._obj else 0
+
+    def close(self):
+        if self._obj is not None:
+            self._obj.close()
+
+
+def write_records(
+    db: Session,
+    file: ProspectsFile,
+    worker_id: str,
+    read_obj: BinaryIO,
+    end: Optional[int],
+    row_number: int,
+    index: EmailIndex,
+    rejected: RejectedRowsWriter,
+    checkpoint: bool,
+    concurrent: bool = False,
+):
+    """Import the records of the file from read_obj's position up to the [end]
+    offset (the end of file if None), in chunks of MAX_PROSPECTS_SIZE rows.
+    [row_number] is the number of the last row before that position.
+
+    Every chunk is validated as a whole, checked against the user's [index] of
+    emails, and committed together with the file's counters, and with a
+    checkpoint if [checkpoint] is set. With [concurrent], other ranges of the
+    file are imported at the same time, so the index can't tell which of the
+    chunk's emails the database has by the time the chunk is written.
+    """
+    lines = OffsetLines(read_obj)
+    csv_reader = reader(lines)
+    if file.has_headers and row_number == 0:
+        next(csv_reader, None)
+        row_number += 1
+
+    def flush(rows: list):
+        prospects, rejected_rows = validate_rows(
+            rows,
+            file.id,
+            file.email_index,
+            file.first_name_index,
+            file.last_name_index,
+        )
+        rejected.write(rejected_rows)
+        known, imported = index.classify(prospects)
+        if not file.force:
+            # Prospects from elsewhere are kept, no need to send them
+            for email in known:
+                del prospects[email]
+            known = set()
+        inserted, updated = ProspectCrud.add_prospects_by_emails(
+            db,
+            file.user_id,
+            prospects,
+            file.force,
+            None if concurrent else known | imported,
+            commit=False,
+        )
+        # Rows written by an earlier attempt of an import starting over were
+        # inserted by this import, though the upsert leaves them alone now
+        inserted += index.take_rewritten(prospects)
+        index.add(prospects)
+        # Blank lines, duplicate emails and existing prospects without force
+        skipped = len(rows) - len(rejected_rows) - inserted - updated
+        if not ProspectsFileCrud.save_progress(
+            db,
+            file.id,
+            worker_id,
+            settings.IMPORT_LEASE_SECONDS,
+            counters={
+                "processed_rows": len(rows),
+                "inserted_rows": inserted,
+                "updated_rows": updated,
+                "skipped_rows": skipped,
+                "rejected_rows": len(rejected_rows),
+            },
+            checkpoint=(
+                {
+                    "checkpoint_offset": lines.offset,
+                    "checkpoint_row": row_number,
+                    "checkpoint_rejected_offset": rejected.tell(),
+                }
+                if checkpoint
+                else None
+            ),
+        ):
+            raise ImportLeaseLost(file.id)
+
+    rows_to_be_processed = []
+    # Collect the rows of a chunk, they are validated together
+    for row in csv_reader:
+        row_number += 1
+        rows_to_be_processed.append((row_number, row))
+        at_end = end is not None and lines.offset >= end
+        if len(rows_to_be_processed) >= MAX_PROSPECTS_SIZE or at_end:
+            flush(rows_to_be_processed)
+            rows_to_be_processed = []
+        if at_end:
+            break
+
+    if len(rows_to_be_processed) > 0:
+        flush(rows_to_be_processed)
+
+
+def write_prospects(db: Session, file: ProspectsFile, worker_id: str):
+    """Extract prospects from a claimed file and insert into database.
+
+    Each chunk is committed together with a checkpoint (byte offset, row number),
+    and an import that was interrupted resumes from its last checkpoint instead
+    of the start of the file.
+
+    Rows that fail validation do not stop the import, they are written to a
+    rejected rows CSV linked from the file.
+    """
+    rejected = RejectedRowsWriter(
+        file.saved_file_name + ".rejected.csv", file.checkpoint_rejected_offset
+    )
+    try:
+        with open_records(file.saved_file_name, file.checkpoint_offset) as read_obj:
+            write_records(
+                db,
+                file,
+                worker_id,
+                read_obj,
+                None,
+                file.checkpoint_row,
+                EmailIndex.build(db, file.user_id, file.id),
+                rejected,
+                checkpoint=True,
+            )
+    finally:
+        rejected.close()
+
+    if rejected.used:
+        ProspectsFileCrud.set_rejected_file(db, file.id, rejected.file_name)
+    if not ProspectsFileCrud.update_file_state(db, file.id, "finished", worker_id):
+        raise ImportLeaseLost(file.id)
+
+
+def write_prospects_range(
     file_id: int,
-    file: str,
-    email_index: int,
-    first_name_index: int,
-    last_name_index: int,
-    force: bool,
-    has_headers: bool,
-    current_user: schemas.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    worker_id: str,
+    start: int,
+    end: int,
+    row_number: int,
+    index: EmailIndex,
+    rejected_file_name: str,
+):
+    """Import one byte range of a file, in a process of the range pool"""
+    db = SessionLocal()
+    rejected = RejectedRowsWriter(rejected_file_name)
+    try:
+        file = ProspectsFileCrud.get_file_by_id(db, file_id)
+        with open_records(file.saved_file_name, start) as read_obj:
+            write_records(
+                db,
+                file,
+                worker_id,
+                read_obj,
+                end,
+                row_number,
+                index,
+                rejected,
+                checkpoint=False,
+                concurrent=True,
+            )
+    finally:
+        rejected.close()
+        db.close()
+    return rejected.used
+
+
+def remove_rejected_parts(rejected_file_name: str):
+    """Delete the rejected rows parts of the ranges of a parallel import"""
+    for part_name in glob.glob(glob.escape(rejected_file_name) + ".*"):
+        os.remove(part_name)
+
+
+def write_prospects_parallel(
+    db: Session, file: ProspectsFile, worker_id: str, processes: int
 ):
-    """Extract prospects from file and insert into database"""
-    user_id = current_user.id
-    ProspectsFileCrud.update_file_state(db, file_id, "processing")
+    """Extract prospects from a claimed file by splitting it in byte ranges
+    aligned on records, imported concurrently by a pool of processes. Only for
+    uncompressed files, compressed streams can't be entered at an offset.
+
+    Prospects remember the row they come from, so the last row still wins among
+    duplicate emails, and all ranges add up to the file's counters. Parallel
+    imports have no checkpoint: an interrupted one starts over, and counts
+    the rows its earlier attempt wrote as inserted again.
+    """
+    ProspectsFileCrud.reset_progress(db, file.id)
+    start, row_number = 0, 0
+    if file.has_headers:
+        with open(file.saved_file_name, "rb") as read_obj:
+            lines = OffsetLines(read_obj)
+            next(reader(lines), None)
+            start, row_number = lines.offset, 1
+    splits = split_records(
+        file.saved_file_name, processes, start, settings.UPLOAD_CHUNK_SIZE
+    )
+
+    # Built once and shipped to every range process
+    index = EmailIndex.build(db, file.user_id, file.id, restart=True)
+    rejected_file_name = file.saved_file_name + ".rejected.csv"
+    part_names = [f"{rejected_file_name}.{i}" for i in range(len(splits) - 1)]
+    # Parts left over by an attempt that was killed
+    remove_rejected_parts(rejected_file_name)
     try:
-        with open(file, "r") as read_obj:
-            csv_reader = reader(read_obj)
-            if has_headers:
-                next(csv_reader)
-            prospects_to_be_processed = {}
-            # Iterate over each row
-            for row in csv_reader:
-                f_name = "" if first_name_index == -1 else row[first_name_index]
-                l_name = "" if last_name_index == -1 else row[last_name_index]
-                prospect = schemas.ProspectCreate(
-                    email=row[email_index].lower(),
-                    first_name=f_name,
-                    last_name=l_name,
-                    file_id=file_id,
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=init_process
+        ) as pool:
+            futures = [
+                pool.submit(
+                    write_prospects_range,
+                    file.id,
+                    worker_id,
+                    range_start,
+                    range_end,
+                    row_number + records_before,
+                    index,
+                    part_name,
                 )
-                prospects_to_be_processed[prospect.email] = prospect
-                if len(prospects_to_be_processed) >= MAX_PROSPECTS_SIZE:
-                    ProspectCrud.add_prospects_by_emails(
-                        db, user_id, prospects_to_be_processed, force
-                    )
-                    prospects_to_be_processed = {}
-
-            if len(prospects_to_be_processed) > 0:
-                ProspectCrud.add_prospects_by_emails(
-                    db, user_id, prospects_to_be_processed, force
+                for (range_start, records_before), (range_end, _), part_name in zip(
+                    splits, splits[1:], part_names
                 )
+            ]
+            used = [future.result() for future in futures]
+    except BaseException:
+        remove_rejected_parts(rejected_file_name)
+        raise
 
-    except ValidationError:
-        ProspectsFileCrud.update_file_state(db, file_id, "failed")
-    else:
-        ProspectsFileCrud.update_file_state(db, file_id, "finished")
+    # Stitch the rejected rows of every range back together, in file order
+    if any(used):
+        with open(rejected_file_name, "wb") as rejected_obj:
+            for part_name, part_used in zip(part_names, used):
+                if part_used:
+                    with open(part_name, "rb") as part_obj:
+                        shutil.copyfileobj(part_obj, rejected_obj)
+                    os.remove(part_name)
+        ProspectsFileCrud.set_rejected_file(db, file.id, rejected_file_name)
+    if not ProspectsFileCrud.update_file_state(db, file.id, "finished", worker_id):
+        raise ImportLeaseLost(file.id)
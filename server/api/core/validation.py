@@ -0,0 +1,72 @@
+import re
+from typing import Dict, List, Tuple
+
+from pydantic.errors import EmailError
+from pydantic.networks import validate_email
+
+# Plain ASCII addresses that are certainly valid. Anything this pattern does
+# not match (quoting, IDNs, display names, ...) goes through pydantic's full
+# EmailStr validator instead.
+FAST_EMAIL_RE = re.compile(
+    r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+([a-z]{2,63})"
+)
+# Special use domains rejected by the full validator
+RESERVED_TLDS = frozenset({"arpa", "invalid", "local", "localhost", "onion", "test"})
+MAX_LOCAL_PART_LENGTH = 64
+MAX_EMAIL_LENGTH = 254
+
+
+def normalize_email(value: str) -> str:
+    """Return the normalized (stripped, lower-cased) email or raise EmailError"""
+    email = value.strip().lower()
+    match = FAST_EMAIL_RE.fullmatch(email)
+    if (
+        match
+        and len(email) <= MAX_EMAIL_LENGTH
+        and email.index("@") <= MAX_LOCAL_PART_LENGTH
+        and match.group(1) not in RESERVED_TLDS
+        and "--" not in email[email.index("@") :]
+    ):
+        return email
+    # Suspect value, fall back to full validation
+    return validate_email(email)[1]
+
+
+def validate_rows(
+    rows: List[Tuple[int, List[str]]],
+    file_id: int,
+    email_index: int,
+    first_name_index: int,
+    last_name_index: int,
+) -> Tuple[Dict[str, dict], List[Tuple[int, str, List[str]]]]:
+    """Validate a chunk of (row number, csv row) pairs in one pass.
+
+    Returns the valid prospects keyed by normalized email (the last row wins
+    for duplicate emails) and the rejected rows as (row number, reason, row).
+    Blank lines are neither.
+    """
+    prospects = {}
+    rejected = []
+    for row_number, row in rows:
+        if not row:
+            # Blank line
+            continue
+        try:
+            email = normalize_email(row[email_index])
+            first_name = "" if first_name_index == -1 else row[first_name_index]
+            last_name = "" if last_name_index == -1 else row[last_name_index]
+        except IndexError:
+            rejected.append((row_number, "missing column", row))
+            continue
+        except EmailError:
+            rejected.append((row_number, "invalid email", row))
+            continue
+        prospects[email] = {
+            "email": email,
+            "first_name": first_name,
+            "last_name": last_name,
+            "file_id": file_id,
+            "file_row": row_number,
+        }
+    return prospects, rejected
@@ -2,3 +2,4 @@ from .user import UserCrud
 from .campaign import CampaignCrud
 from .prospect import ProspectCrud
 from .prospects_file import ProspectsFileCrud
+from .campaign_assignment import CampaignAssignmentCrud
@@ -0,0 +1,3 @@
+from .user import AsyncUserCrud
+from .campaign import AsyncCampaignCrud
+from .prospect import AsyncProspectCrud
@@ -0,0 +1,117 @@
+from typing import List, Optional, Union
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import select
+from api import schemas
+from api.models import Campaign, CampaignProspect, Prospect
+from api.core.config import settings
+from api.core.pagination import Cursor, Page, keyset_page_async, offset_page_async
+from api.core.search import campaign_name_indexes
+from ..campaign import LIST_COLUMNS, PROSPECT_LIST_COLUMNS, CampaignCrud
+from .user import AsyncUserCrud
+from api.core.constants import (
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_PAGE,
+    MIN_PAGE,
+    MAX_PAGE_SIZE,
+)
+
+
+class AsyncCampaignCrud:
+    """Reads of CampaignCrud for async endpoints"""
+
+    @classmethod
+    async def get_users_campaign(
+        cls,
+        db: AsyncSession,
+        user_id: int,
+        page: int = DEFAULT_PAGE,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[Cursor] = None,
+        sort: schemas.CampaignSort = schemas.CampaignSort.id,
+        descending: bool = False,
+    ) -> Page:
+        """Get a page of user's campaigns ordered by id or by prospects count
+        (then id), after (or before) the cursor if given, else by page number
+        """
+        if page < MIN_PAGE:
+            page = MIN_PAGE
+        if page_size > MAX_PAGE_SIZE:
+            page_size = MAX_PAGE_SIZE
+        statement = select(*LIST_COLUMNS).where(Campaign.user_id == user_id)
+        order_by = CampaignCrud.sort_columns(sort)
+        if cursor is not None:
+            return await keyset_page_async(
+                db, statement, order_by, cursor, page_size, descending
+            )
+        return await offset_page_async(
+            db, statement, order_by, page, page_size, descending
+        )
+
+    @classmethod
+    async def get_user_campaign_total(cls, db: AsyncSession, user_id: int) -> int:
+        return await AsyncUserCrud.get_total(db, user_id, "campaigns_total")
+
+    @classmethod
+    async def get_user_campaign_from_name_fragment(
+        cls, db: AsyncSession, user_id: int, name_fragment: str, limit: int
+    ) -> List[Row]:
+        """Search user's campaigns by name, ranked like
+        CampaignCrud.get_user_campaign_from_name_fragment
+        """
+        name_fragment = name_fragment.strip()
+        if not name_fragment:
+            return []
+        limit = max(1, min(limit, settings.CAMPAIGN_SEARCH_MAX_LIMIT))
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(CampaignCrud.trigram_threshold_statement())
+            result = await db.execute(
+                CampaignCrud.trigram_search_statement(user_id, name_fragment, limit)
+            )
+            return result.all()
+
+        index = campaign_name_indexes.get(user_id)
+        # Catch up with the campaigns created since, by any process
+        result = await db.execute(
+            select(Campaign.id, Campaign.name)
+            .where(Campaign.user_id == user_id, Campaign.id > index.max_id)
+            .order_by(Campaign.id)
+        )
+        index.load(result.all())
+        ids = index.search(name_fragment, limit, settings.CAMPAIGN_SEARCH_SIMILARITY)
+        result = await db.execute(select(*LIST_COLUMNS).where(Campaign.id.in_(ids)))
+        campaigns = {campaign.id: campaign for campaign in result}
+        return [campaigns[campaign_id] for campaign_id in ids]
+
+    @classmethod
+    async def get_campaign_header(
+        cls, db: AsyncSession, campaign_id: int
+    ) -> Union[Row, None]:
+        result = await db.execute(CampaignCrud.header_statement(campaign_id))
+        return result.one_or_none()
+
+    @classmethod
+    async def get_campaign_prospects(
+        cls,
+        db: AsyncSession,
+        campaign_id: int,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[Cursor] = None,
+    ) -> Page:
+        """Get a page of the campaign's prospects ordered by id, after (or
+        before) the cursor if given, in a single join query
+        """
+        if page_size > MAX_PAGE_SIZE:
+            page_size = MAX_PAGE_SIZE
+        statement = (
+            select(*PROSPECT_LIST_COLUMNS)
+            .join(CampaignProspect, CampaignProspect.prospect_id == Prospect.id)
+            .where(CampaignProspect.campaign_id == campaign_id)
+        )
+        return await keyset_page_async(db, statement, [Prospect.id], cursor, page_size)
+
+    @classmethod
+    async def get_by_id(
+        cls, db: AsyncSession, campaign_id: int
+    ) -> Union[Campaign, None]:
+        return await db.get(Campaign, campaign_id)
@@ -0,0 +1,64 @@
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import select
+from api import schemas
+from api.models import Prospect
+from api.core.pagination import Cursor, Page, keyset_page_async, offset_page_async
+from ..prospect import LIST_COLUMNS, ProspectCrud
+from .user import AsyncUserCrud
+from api.core.constants import (
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_PAGE,
+    MIN_PAGE,
+    MAX_PAGE_SIZE,
+)
+
+
+class AsyncProspectCrud:
+    """Reads of ProspectCrud for async endpoints"""
+
+    @classmethod
+    async def get_users_prospects(
+        cls,
+        db: AsyncSession,
+        user_id: int,
+        page: int = DEFAULT_PAGE,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[Cursor] = None,
+    ) -> Page:
+        """Get a page of user's prospects ordered by id, after (or before) the
+        cursor if given, else by page number
+        """
+        if page < MIN_PAGE:
+            page = MIN_PAGE
+        if page_size > MAX_PAGE_SIZE:
+            page_size = MAX_PAGE_SIZE
+        statement = select(*LIST_COLUMNS).where(Prospect.user_id == user_id)
+        if cursor is not None:
+            return await keyset_page_async(
+                db, statement, [Prospect.id], cursor, page_size
+            )
+        return await offset_page_async(db, statement, [Prospect.id], page, page_size)
+
+    @classmethod
+    async def search_prospects(
+        cls,
+        db: AsyncSession,
+        user_id: int,
+        filters: schemas.ProspectSearch,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[Cursor] = None,
+    ) -> Page:
+        """Get a page of user's prospects matching all the given filters,
+        ordered by id
+        """
+        if page_size > MAX_PAGE_SIZE:
+            page_size = MAX_PAGE_SIZE
+        statement = select(*LIST_COLUMNS).where(
+            *ProspectCrud.search_criteria(user_id, filters)
+        )
+        return await keyset_page_async(db, statement, [Prospect.id], cursor, page_size)
+
+    @classmethod
+    async def get_user_prospects_total(cls, db: AsyncSession, user_id: int) -> int:
+        return await AsyncUserCrud.get_total(db, user_id, "prospects_total")
@@ -0,0 +1,50 @@
+from typing import Optional, Union
+from pydantic.networks import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.expression import select
+from sqlalchemy.sql.functions import func
+from api.core.config import settings
+from api.models import User
+from ..user import TOTALS, UserCrud
+
+
+class AsyncUserCrud:
+    """Reads of UserCrud for async endpoints"""
+
+    @classmethod
+    async def get_user_by_email(
+        cls, db: AsyncSession, email: EmailStr
+    ) -> Union[User, None]:
+        """Get a single user by email"""
+        result = await db.execute(select(User).where(User.email == email.lower()))
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def get_data_version(cls, db: AsyncSession, user_id: int) -> int:
+        return await db.scalar(select(User.data_version).where(User.id == user_id))
+
+    @classmethod
+    async def get_total(cls, db: AsyncSession, user_id: int, name: str) -> int:
+        """Get one of the user's totals, the way settings.TOTALS_MODE says"""
+        model, owner = TOTALS[name]
+        count = select(func.count()).select_from(model).where(owner == user_id)
+        if settings.TOTALS_MODE == "exact":
+            return await db.scalar(count)
+        if settings.TOTALS_MODE == "estimated":
+            rows = select(model).where(owner == user_id)
+            estimate = await cls._estimate_rows(db, rows)
+            if estimate is not None and estimate >= settings.TOTALS_ESTIMATE_MIN:
+                return estimate
+            return await db.scalar(count)
+        total = await db.scalar(select(getattr(User, name)).where(User.id == user_id))
+        return total or 0
+
+    @classmethod
+    async def _estimate_rows(cls, db: AsyncSession, rows: Select) -> Optional[int]:
+        """Row count the Postgres planner expects for a query, None elsewhere"""
+        dialect = db.bind.dialect
+        if dialect.name != "postgresql":
+            return None
+        plan = await db.scalar(UserCrud.explain_statement(dialect, rows))
+        return int(plan[0]["Plan"]["Plan Rows"])
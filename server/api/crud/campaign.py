@@ -1,11 +1,28 @@
-from typing import List, Set, Union
+from typing import List, Optional, Set, Union
+from sqlalchemy.engine import Row
 from sqlalchemy.orm.session import Session
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.expression import exists, literal, or_, select
+from sqlalchemy.sql.sqltypes import BigInteger
 from sqlalchemy.sql.functions import func
 from api import schemas
-from api.models import Campaign, CampaignProspect
-from api.core.constants import DEFAULT_PAGE_SIZE, DEFAULT_PAGE, MIN_PAGE, MAX_PAGE_SIZE
+from api.database import batch_size_for, upsert_insert
+from api.models import Campaign, CampaignProspect, Prospect, User
+from api.core.config import settings
+from api.core.pagination import Cursor, Page, keyset_page, offset_page
+from api.core.search import LIKE_ESCAPE, campaign_name_indexes, escape_like
+from .prospect import LIST_COLUMNS as PROSPECT_LIST_COLUMNS
+from .user import UserCrud
+from api.core.constants import (
+    CAMPAIGN_LINK_BATCH_SIZE,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_PAGE,
+    MIN_PAGE,
+    MAX_PAGE_SIZE,
+)
 
-MAX_SEARCH_RESULTS = 10
+# Columns of the list endpoints, the fields of their schema
+LIST_COLUMNS = tuple(getattr(Campaign, name) for name in schemas.Campaign.__fields__)
 
 
 class CampaignCrud:
@@ -16,38 +33,141 @@ class CampaignCrud:
         user_id: int,
         page: int = DEFAULT_PAGE,
         page_size: int = DEFAULT_PAGE_SIZE,
-    ) -> Union[List[schemas.Campaign], None]:
-        """Get user's campaigns"""
+        cursor: Optional[Cursor] = None,
+        sort: schemas.CampaignSort = schemas.CampaignSort.id,
+        descending: bool = False,
+    ) -> Page:
+        """Get a page of user's campaigns ordered by id or by prospects count
+        (then id), after (or before) the cursor if given, else by page number
+        """
         if page < MIN_PAGE:
             page = MIN_PAGE
         if page_size > MAX_PAGE_SIZE:
             page_size = MAX_PAGE_SIZE
-        res = (
-            db.query(Campaign)
-            .filter(
-                Campaign.user_id == user_id,
-            )
-            .offset(page * page_size)
-            .limit(page_size)
-            .all()
+        query = db.query(*LIST_COLUMNS).filter(Campaign.user_id == user_id)
+        order_by = cls.sort_columns(sort)
+        if cursor is not None:
+            return keyset_page(query, order_by, cursor, page_size, descending)
+        return offset_page(query, order_by, page, page_size, descending)
+
+    @classmethod
+    def sort_columns(cls, sort: schemas.CampaignSort) -> list:
+        if sort == schemas.CampaignSort.prospects_count:
+            return [Campaign.prospects_count, Campaign.id]
+        return [Campaign.id]
+
+    @classmethod
+    def get_campaign_header(cls, db: Session, campaign_id: int) -> Union[Row, None]:
+        return db.execute(cls.header_statement(campaign_id)).one_or_none()
+
+    @classmethod
+    def header_statement(cls, campaign_id: int) -> Select:
+        """Owner, prospects count and owner's data version of a campaign, in
+        a single query
+        """
+        return (
+            select(Campaign.user_id, Campaign.prospects_count, User.data_version)
+            .join(User, User.id == Campaign.user_id)
+            .where(Campaign.id == campaign_id)
         )
-        return res
+
+    @classmethod
+    def get_campaign_prospects(
+        cls,
+        db: Session,
+        campaign_id: int,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[Cursor] = None,
+    ) -> Page:
+        """Get a page of the campaign's prospects ordered by id, after (or
+        before) the cursor if given. A single join query walking the
+        (campaign_id, prospect_id) unique index, with the prospects' list
+        columns only.
+        """
+        if page_size > MAX_PAGE_SIZE:
+            page_size = MAX_PAGE_SIZE
+        query = (
+            db.query(*PROSPECT_LIST_COLUMNS)
+            .join(CampaignProspect, CampaignProspect.prospect_id == Prospect.id)
+            .filter(CampaignProspect.campaign_id == campaign_id)
+        )
+        # Prospect.id equals the joined prospect_id, so the index also serves
+        # the sort and the cursor's range
+        return keyset_page(query, [Prospect.id], cursor, page_size)
 
     @classmethod
     def get_user_campaign_total(cls, db: Session, user_id: int) -> int:
-        return db.query(Campaign).filter(Campaign.user_id == user_id).count()
+        return UserCrud.get_total(db, user_id, "campaigns_total")
 
     @classmethod
     def get_user_campaign_from_name_fragment(
-        cls, db: Session, user_id: int, name_fragment: str
-    ) -> Union[List[Campaign], None]:
+        cls, db: Session, user_id: int, name_fragment: str, limit: int
+    ) -> List[Row]:
+        """Search user's campaigns by name: names starting with the fragment
+        first, then names containing it, then names with a word similar to it
+        (trigram word similarity, so typos still match)
+        """
+        name_fragment = name_fragment.strip()
+        if not name_fragment:
+            return []
+        limit = max(1, min(limit, settings.CAMPAIGN_SEARCH_MAX_LIMIT))
+        if db.get_bind().dialect.name == "postgresql":
+            return cls._search_trigram_index(db, user_id, name_fragment, limit)
+
+        index = campaign_name_indexes.get(user_id)
+        # Catch up with the campaigns created since, by any process
+        index.load(
+            db.query(Campaign.id, Campaign.name)
+            .filter(Campaign.user_id == user_id, Campaign.id > index.max_id)
+            .order_by(Campaign.id)
+        )
+        ids = index.search(name_fragment, limit, settings.CAMPAIGN_SEARCH_SIMILARITY)
+        campaigns = {
+            campaign.id: campaign
+            for campaign in db.query(*LIST_COLUMNS).filter(Campaign.id.in_(ids))
+        }
+        return [campaigns[campaign_id] for campaign_id in ids]
+
+    @classmethod
+    def _search_trigram_index(
+        cls, db: Session, user_id: int, name_fragment: str, limit: int
+    ) -> List[Row]:
+        db.execute(cls.trigram_threshold_statement())
+        return db.execute(
+            cls.trigram_search_statement(user_id, name_fragment, limit)
+        ).all()
+
+    @classmethod
+    def trigram_threshold_statement(cls) -> Select:
+        """Set the threshold of the <% operator, for this transaction only"""
+        return select(
+            func.set_config(
+                "pg_trgm.word_similarity_threshold",
+                str(settings.CAMPAIGN_SEARCH_SIMILARITY),
+                True,
+            )
+        )
+
+    @classmethod
+    def trigram_search_statement(
+        cls, user_id: int, name_fragment: str, limit: int
+    ) -> Select:
+        """Postgres search, served by the pg_trgm index on (user_id, name)"""
+        escaped = escape_like(name_fragment)
+        contains = Campaign.name.ilike(f"%{escaped}%", escape=LIKE_ESCAPE)
         return (
-            db.query(Campaign)
-            .filter(
-                Campaign.user_id == user_id, Campaign.name.ilike(f"%{name_fragment}%")
+            select(*LIST_COLUMNS)
+            .where(
+                Campaign.user_id == user_id,
+                or_(contains, literal(name_fragment).op("<%")(Campaign.name)),
+            )
+            .order_by(
+                Campaign.name.ilike(f"{escaped}%", escape=LIKE_ESCAPE).desc(),
+                contains.desc(),
+                func.word_similarity(name_fragment, Campaign.name).desc(),
+                Campaign.id,
             )
-            .limit(MAX_SEARCH_RESULTS)
-            .all()
+            .limit(limit)
         )
 
     @classmethod
@@ -57,29 +177,107 @@ class CampaignCrud:
         """Create a user"""
         campaign = Campaign(name=data.name, user_id=user_id)
         db.add(campaign)
+        UserCrud.record_changes(db, user_id, campaigns_total=1)
         db.commit()
         db.refresh(campaign)
+        campaign_name_indexes.add(user_id, campaign.id, campaign.name)
         return campaign
 
     @classmethod
-    def get_existing_campaign_prospects(cls, db: Session, campaign_id: int) -> Set[int]:
-        res = (
-            db.query(CampaignProspect.prospect_id)
-            .filter(CampaignProspect.campaign_id == campaign_id)
-            .all()
+    def add_prospects_to_campaign(
+        cls, db: Session, campaign_id: int, user_id: int, prospect_ids: Set[int]
+    ) -> List[int]:
+        """Add the user's prospects among [prospect_ids] to the campaign, in
+        chunks of CAMPAIGN_LINK_BATCH_SIZE (fewer on SQLite, whose statements
+        take a limited number of parameters). Ids of other users' prospects, or
+        already in the campaign, are skipped. Returns the ids added.
+        """
+        ids = sorted(prospect_ids)
+        # The campaign and user ids are bound alongside the chunk
+        batch_size = batch_size_for(db, CAMPAIGN_LINK_BATCH_SIZE, 1, extra_params=2)
+        added = []
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start : start + batch_size]
+            added += cls.link_prospects(
+                db,
+                campaign_id,
+                user_id,
+                [Prospect.user_id == user_id, Prospect.id.in_(chunk)],
+            )
+        db.commit()
+        return added
+
+    @classmethod
+    def link_prospects(
+        cls, db: Session, campaign_id: int, user_id: int, criteria: list
+    ) -> List[int]:
+        """Add the prospects matching [criteria] to the campaign with a single
+        INSERT ... SELECT ... ON CONFLICT DO NOTHING, in the caller's
+        transaction. Returns the ids of the prospects added.
+        """
+        stmt = (
+            upsert_insert(db, CampaignProspect.__table__)
+            .from_select(
+                [CampaignProspect.campaign_id, CampaignProspect.prospect_id],
+                select(literal(campaign_id, BigInteger), Prospect.id).where(*criteria),
+            )
+            .on_conflict_do_nothing(
+                index_elements=[
+                    CampaignProspect.campaign_id,
+                    CampaignProspect.prospect_id,
+                ]
+            )
         )
-        return {row.prospect_id for row in res}
+        if db.get_bind().dialect.name == "postgresql":
+            added = [
+                row.prospect_id
+                for row in db.execute(stmt.returning(CampaignProspect.prospect_id))
+            ]
+        else:
+            # No RETURNING: read the prospects not linked yet beforehand
+            added = [
+                row.id
+                for row in db.query(Prospect.id).filter(
+                    *criteria,
+                    ~exists().where(
+                        CampaignProspect.campaign_id == campaign_id,
+                        CampaignProspect.prospect_id == Prospect.id,
+                    ),
+                )
+            ]
+            db.execute(stmt)
+        if added:
+            db.query(Campaign).filter(Campaign.id == campaign_id).update(
+                {Campaign.prospects_count: Campaign.prospects_count + len(added)},
+                synchronize_session=False,
+            )
+            UserCrud.record_changes(db, user_id)
+        return added
 
     @classmethod
-    def add_prospects_to_campaign(
-        cls, db: Session, campaign_id: int, prospect_ids: Set[int]
-    ):
-        links = [
-            CampaignProspect(campaign_id=campaign_id, prospect_id=prospect_id)
-            for prospect_id in prospect_ids
-        ]
-        db.add_all(links)
+    def reconcile_prospects_counts(cls, db: Session) -> int:
+        """Recount the prospects of every campaign and repair the counts that
+        drifted. Returns the number of campaigns repaired.
+        """
+        count = (
+            select(func.count())
+            .select_from(CampaignProspect)
+            .where(CampaignProspect.campaign_id == Campaign.id)
+            .scalar_subquery()
+        )
+        drifted = Campaign.prospects_count != count
+        # A new data version for their owners, so cached listings pick up the
+        # repaired counts
+        db.query(User).filter(
+            User.id.in_(select(Campaign.user_id).where(drifted))
+        ).update({User.data_version: User.data_version + 1}, synchronize_session=False)
+        repaired = (
+            db.query(Campaign)
+            .filter(drifted)
+            .update({Campaign.prospects_count: count}, synchronize_session=False)
+        )
         db.commit()
+        return repaired
 
     @classmethod
     def get_by_id(cls, db: Session, campaign_id: int) -> Union[Campaign, None]:
@@ -0,0 +1,120 @@
+from typing import Dict, List, Optional, Union
+from sqlalchemy.orm.session import Session
+from api import schemas
+from api.models import CampaignAssignment
+from .jobs import (
+    claim_next_job,
+    get_processing_jobs,
+    requeue_job,
+    resume_job,
+    save_job_progress,
+    update_job_state,
+)
+
+
+class CampaignAssignmentCrud:
+    @classmethod
+    def create_assignment(
+        cls, db: Session, user_id: int, data: schemas.CampaignAssignmentCreate
+    ) -> CampaignAssignment:
+        assignment = CampaignAssignment(
+            user_id=user_id,
+            campaign_ids=sorted(data.campaign_ids),
+            selector=data.selector.dict(exclude_none=True),
+        )
+        db.add(assignment)
+        db.commit()
+        db.refresh(assignment)
+        return assignment
+
+    @classmethod
+    def get_by_id(
+        cls, db: Session, assignment_id: int
+    ) -> Union[CampaignAssignment, None]:
+        return (
+            db.query(CampaignAssignment)
+            .filter(CampaignAssignment.id == assignment_id)
+            .one_or_none()
+        )
+
+    @classmethod
+    def update_state(
+        cls,
+        db: Session,
+        assignment_id: int,
+        status: str,
+        worker_id: Optional[str] = None,
+    ) -> int:
+        """Set the assignment's status, only while worker_id holds its claim if
+        given
+        """
+        return update_job_state(
+            db, CampaignAssignment, assignment_id, status, worker_id
+        )
+
+    @classmethod
+    def set_total(cls, db: Session, assignment_id: int, total: int):
+        db.query(CampaignAssignment).filter(
+            CampaignAssignment.id == assignment_id
+        ).update({CampaignAssignment.total_rows: total}, synchronize_session=False)
+        db.commit()
+
+    @classmethod
+    def claim_next_assignment(
+        cls, db: Session, worker_id: str, lease_seconds: int, max_attempts: int
+    ) -> Union[CampaignAssignment, None]:
+        """Claim the oldest queued assignment, or one whose worker stopped
+        heartbeating, and lease it to worker_id
+        """
+        assignment_id = claim_next_job(
+            db, CampaignAssignment, worker_id, lease_seconds, max_attempts
+        )
+        if assignment_id is None:
+            return None
+        return cls.get_by_id(db, assignment_id)
+
+    @classmethod
+    def save_progress(
+        cls,
+        db: Session,
+        assignment_id: int,
+        worker_id: str,
+        lease_seconds: int,
+        counters: Dict[str, int],
+        checkpoint: Optional[Dict[str, int]] = None,
+    ) -> bool:
+        """Commit the batch pending in the session with the assignment's
+        counters and checkpoint. Returns False if the claim was lost.
+        """
+        return save_job_progress(
+            db,
+            CampaignAssignment,
+            assignment_id,
+            worker_id,
+            lease_seconds,
+            counters,
+            checkpoint,
+        )
+
+    @classmethod
+    def get_processing_assignments(
+        cls, db: Session, claimed_by_prefix: str
+    ) -> List[CampaignAssignment]:
+        """Assignments in progress claimed by workers whose id starts with the
+        prefix
+        """
+        return get_processing_jobs(db, CampaignAssignment, claimed_by_prefix)
+
+    @classmethod
+    def requeue_assignment(cls, db: Session, assignment_id: int) -> bool:
+        """Put an interrupted assignment back in the queue, keeping its
+        checkpoint
+        """
+        return requeue_job(db, CampaignAssignment, assignment_id)
+
+    @classmethod
+    def resume_assignment(cls, db: Session, assignment_id: int) -> bool:
+        """Queue a failed or stalled assignment to resume from its checkpoint.
+        Returns False if the assignment is not resumable.
+        """
+        return resume_job(db, CampaignAssignment, assignment_id)
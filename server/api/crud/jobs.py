@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Union
+from sqlalchemy.orm.session import Session
+from sqlalchemy.sql.expression import and_, or_
+
+# Job queue tables (import files, campaign assignments) share the columns
+# status, claimed_by, lease_expires_at, heartbeat_at and attempts
+
+
+def claim_next_job(
+    db: Session, model, worker_id: str, lease_seconds: int, max_attempts: int
+) -> Union[int, None]:
+    """Claim the oldest queued job of the [model] table, or one whose worker
+    stopped heartbeating, and lease it to worker_id. Returns its id.
+    """
+    now = datetime.now(timezone.utc)
+    # Jobs out of attempts would never be claimed again, nor leave "processing"
+    fail_exhausted_jobs(db, model, max_attempts, now)
+    claimable = or_(
+        model.status == "created",
+        and_(
+            model.status == "processing",
+            model.lease_expires_at < now,
+            model.attempts < max_attempts,
+        ),
+    )
+    # SKIP LOCKED lets concurrent workers pass over each other's candidates
+    job_id = (
+        db.query(model.id)
+        .filter(claimable)
+        .order_by(model.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar()
+    )
+    if job_id is None:
+        db.rollback()
+        return None
+    # Re-check the predicate on update, which keeps the claim atomic on
+    # databases without row locks (SQLite)
+    claimed = (
+        db.query(model)
+        .filter(model.id == job_id, claimable)
+        .update(
+            {
+                model.status: "processing",
+                model.claimed_by: worker_id,
+                model.heartbeat_at: now,
+                model.lease_expires_at: now + timedelta(seconds=lease_seconds),
+                model.attempts: model.attempts + 1,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return job_id if claimed else None
+
+
+def save_job_progress(
+    db: Session,
+    model,
+    job_id: int,
+    worker_id: str,
+    lease_seconds: int,
+    counters: Dict[str, int],
+    checkpoint: Optional[Dict[str, int]] = None,
+) -> bool:
+    """Record the progress made by the work pending in the session, extend the
+    lease held by worker_id, and commit both together.
+
+    [counters] maps counter columns to their increments and [checkpoint]
+    columns to their new values. Returns False (and rolls back) if the claim
+    was lost.
+    """
+    now = datetime.now(timezone.utc)
+    values = {
+        model.heartbeat_at: now,
+        model.lease_expires_at: now + timedelta(seconds=lease_seconds),
+    }
+    for name, increment in counters.items():
+        column = getattr(model, name)
+        values[column] = column + increment
+    for name, value in (checkpoint or {}).items():
+        values[getattr(model, name)] = value
+    extended = (
+        db.query(model)
+        .filter(
+            model.id == job_id,
+            model.claimed_by == worker_id,
+            model.status == "processing",
+        )
+        .update(values, synchronize_session=False)
+    )
+    if not extended:
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
+
+def fail_exhausted_jobs(db: Session, model, max_attempts: int, now: datetime) -> int:
+    """Mark failed the jobs of the [model] table whose worker stopped
+    heartbeating and that have no attempts left. Returns how many.
+    """
+    failed = (
+        db.query(model)
+        .filter(
+            model.status == "processing",
+            model.lease_expires_at < now,
+            model.attempts >= max_attempts,
+        )
+        .update({model.status: "failed"}, synchronize_session=False)
+    )
+    db.commit()
+    return failed
+
+
+def update_job_state(
+    db: Session, model, job_id: int, status: str, worker_id: Optional[str] = None
+) -> int:
+    """Set the status of a job of the [model] table. With [worker_id], only
+    while that worker still holds the claim, so a worker whose lease was taken
+    over can't overwrite the new owner's state. Returns the rows updated.
+    """
+    query = db.query(model).filter(model.id == job_id)
+    if worker_id is not None:
+        query = query.filter(
+            model.claimed_by == worker_id, model.status == "processing"
+        )
+    updated = query.update({model.status: status}, synchronize_session=False)
+    db.commit()
+    return updated
+
+
+def get_processing_jobs(db: Session, model, claimed_by_prefix: str) -> List:
+    """Jobs of the [model] table in progress, claimed by workers whose id starts
+    with the prefix
+    """
+    return (
+        db.query(model)
+        .filter(
+            model.status == "processing",
+            model.claimed_by.startswith(claimed_by_prefix),
+        )
+        .all()
+    )
+
+
+def requeue_job(db: Session, model, job_id: int) -> bool:
+    """Put an interrupted job of the [model] table back in the queue. It keeps
+    its checkpoint, so the next worker resumes where the previous one stopped.
+    """
+    return _requeue(db, model, job_id, model.status == "processing")
+
+
+def resume_job(db: Session, model, job_id: int) -> bool:
+    """Queue a failed job of the [model] table, or one whose worker stopped
+    heartbeating, to resume from its checkpoint with fresh attempts. Returns
+    False if the job is not resumable.
+    """
+    resumable = or_(
+        model.status == "failed",
+        and_(
+            model.status == "processing",
+            model.lease_expires_at < datetime.now(timezone.utc),
+        ),
+    )
+    return _requeue(db, model, job_id, resumable, reset_attempts=True)
+
+
+def _requeue(
+    db: Session, model, job_id: int, condition, reset_attempts: bool = False
+) -> bool:
+    values = {
+        model.status: "created",
+        model.claimed_by: None,
+        model.lease_expires_at: None,
+    }
+    if reset_attempts:
+        values[model.attempts] = 0
+    requeued = (
+        db.query(model)
+        .filter(model.id == job_id, condition)
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    return bool(requeued)
@@ -1,8 +1,25 @@
-from typing import List, Set, Union
+from typing import Iterator, Optional, Set, Tuple
+from sqlalchemy.orm import Query
 from sqlalchemy.orm.session import Session
+from sqlalchemy.sql.expression import and_, exists, literal_column, or_, select
+from sqlalchemy.sql.functions import func
 from api import schemas
-from api.models import Prospect
-from api.core.constants import DEFAULT_PAGE_SIZE, DEFAULT_PAGE, MIN_PAGE, MAX_PAGE_SIZE
+from api.database import batch_size_for, upsert_insert
+from api.models import CampaignProspect, Prospect
+from api.core.pagination import Cursor, Page, keyset_page, offset_page
+from api.core.search import LIKE_ESCAPE, escape_like
+from .user import UserCrud
+from api.core.constants import (
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_PAGE,
+    MIN_PAGE,
+    MAX_PAGE_SIZE,
+    STREAM_BATCH_SIZE,
+    EXPORT_COLUMNS,
+)
+
+# Columns of the list endpoints, the fields of their schema
+LIST_COLUMNS = tuple(getattr(Prospect, name) for name in schemas.Prospect.__fields__)
 
 
 class ProspectCrud:
@@ -13,56 +30,216 @@ class ProspectCrud:
         user_id: int,
         page: int = DEFAULT_PAGE,
         page_size: int = DEFAULT_PAGE_SIZE,
-    ) -> Union[List[Prospect], None]:
-        """Get user's prospects"""
+        cursor: Optional[Cursor] = None,
+    ) -> Page:
+        """Get a page of user's prospects ordered by id, after (or before) the
+        cursor if given, else by page number
+        """
         if page < MIN_PAGE:
             page = MIN_PAGE
         if page_size > MAX_PAGE_SIZE:
             page_size = MAX_PAGE_SIZE
+        query = db.query(*LIST_COLUMNS).filter(Prospect.user_id == user_id)
+        if cursor is not None:
+            return keyset_page(query, [Prospect.id], cursor, page_size)
+        return offset_page(query, [Prospect.id], page, page_size)
+
+    @classmethod
+    def search_prospects(
+        cls,
+        db: Session,
+        user_id: int,
+        filters: schemas.ProspectSearch,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[Cursor] = None,
+    ) -> Page:
+        """Get a page of user's prospects matching all the given filters,
+        ordered by id. Each filter has a (user_id, ...) index.
+        """
+        if page_size > MAX_PAGE_SIZE:
+            page_size = MAX_PAGE_SIZE
+        query = cls._filter(db.query(*LIST_COLUMNS), user_id, filters)
+        return keyset_page(query, [Prospect.id], cursor, page_size)
+
+    @classmethod
+    def iter_export_rows(
+        cls, db: Session, user_id: int, filters: schemas.ProspectSearch
+    ) -> Iterator[tuple]:
+        """Stream the EXPORT_COLUMNS of user's prospects matching the filters,
+        ordered by id, through a server-side cursor
+        """
+        query = db.query(*(getattr(Prospect, name) for name in EXPORT_COLUMNS))
         return (
-            db.query(Prospect)
-            .filter(Prospect.user_id == user_id)
-            .offset(page * page_size)
-            .limit(page_size)
-            .all()
+            cls._filter(query, user_id, filters)
+            .order_by(Prospect.id)
+            .execution_options(stream_results=True)
+            .yield_per(STREAM_BATCH_SIZE)
         )
 
     @classmethod
-    def add_prospects_by_emails(
-        cls, db: Session, user_id: int, data: dict, force: bool
-    ):
-        rows_need_update = (
-            db.query(Prospect)
-            .filter(Prospect.email.in_(data))
-            .filter(Prospect.user_id == user_id)
+    def count_matching(
+        cls, db: Session, user_id: int, filters: schemas.ProspectSearch
+    ) -> int:
+        return (
+            db.query(func.count(Prospect.id))
+            .filter(*cls.search_criteria(user_id, filters))
+            .scalar()
         )
-        if force:
-            for row in rows_need_update:
-                row.first_name = data[row.email].first_name
-                row.last_name = data[row.email].last_name
-                row.file_id = data[row.email].file_id
-        for row in rows_need_update:
-            del data[row.email]
-        inserts = [
-            Prospect(
-                email=data[k].email,
-                first_name=data[k].first_name,
-                last_name=data[k].last_name,
-                file_id=data[k].file_id,
-                user_id=user_id,
+
+    @classmethod
+    def next_batch_bounds(
+        cls,
+        db: Session,
+        user_id: int,
+        filters: schemas.ProspectSearch,
+        after_id: int,
+        size: int,
+    ) -> Tuple[int, Optional[int]]:
+        """Count and last id of the next [size] prospects matching the filters,
+        by id after after_id, so the batch is the id range (after_id, last id]
+        """
+        ids = (
+            select(Prospect.id)
+            .where(*cls.search_criteria(user_id, filters), Prospect.id > after_id)
+            .order_by(Prospect.id)
+            .limit(size)
+            .subquery()
+        )
+        return tuple(db.query(func.count(), func.max(ids.c.id)).one())
+
+    @classmethod
+    def _filter(cls, query: Query, user_id: int, filters: schemas.ProspectSearch):
+        return query.filter(*cls.search_criteria(user_id, filters))
+
+    @classmethod
+    def search_criteria(cls, user_id: int, filters: schemas.ProspectSearch) -> list:
+        """WHERE criteria of user's prospects matching the search filters"""
+        criteria = [Prospect.user_id == user_id]
+        if filters.email_prefix:
+            pattern = escape_like(filters.email_prefix.lower()) + "%"
+            criteria.append(Prospect.email.like(pattern, escape=LIKE_ESCAPE))
+        if filters.email_domain:
+            domain = filters.email_domain.lower().lstrip("@")
+            criteria.append(Prospect.email_domain == domain)
+        if filters.name_prefix:
+            pattern = escape_like(filters.name_prefix.lower()) + "%"
+            criteria.append(
+                or_(
+                    func.lower(Prospect.first_name).like(pattern, escape=LIKE_ESCAPE),
+                    func.lower(Prospect.last_name).like(pattern, escape=LIKE_ESCAPE),
+                )
             )
-            for k in data
-        ]
-        db.add_all(inserts)
-        db.commit()
+        if filters.file_id is not None:
+            criteria.append(Prospect.file_id == filters.file_id)
+        if filters.campaign_id is not None:
+            criteria.append(
+                exists().where(
+                    CampaignProspect.campaign_id == filters.campaign_id,
+                    CampaignProspect.prospect_id == Prospect.id,
+                )
+            )
+        return criteria
 
     @classmethod
-    def get_user_prospects_total(cls, db: Session, user_id: int) -> int:
-        return db.query(Prospect).filter(Prospect.user_id == user_id).count()
+    def add_prospects_by_emails(
+        cls,
+        db: Session,
+        user_id: int,
+        data: dict,
+        force: bool,
+        existing: Optional[Set[str]],
+        commit: bool = True,
+    ) -> Tuple[int, int]:
+        """Insert a chunk of prospects (plain dicts keyed by email) with a single
+        INSERT ... ON CONFLICT (user_id, email) statement (several on SQLite,
+        which limits the parameters of a statement). [existing] holds the
+        emails of the chunk known to exist already, or None if the caller can't
+        know them (imports writing concurrently). Returns (inserted, updated)
+        counts. With commit=False the caller owns the transaction.
+
+        Prospects from other files are only overwritten when force is set.
+        Prospects from the same file are overwritten by later rows of the file,
+        so the last row wins whatever the order chunks are written in.
+        """
+        if not data:
+            return 0, 0
+        # In email order, so concurrent imports of overlapping chunks lock the
+        # (user_id, email) rows in the same order and can't deadlock
+        rows = [dict(data[email], user_id=user_id) for email in sorted(data)]
+        if db.get_bind().dialect.name == "postgresql":
+            # xmax is only set on rows that existed before the statement
+            stmt = cls._upsert(db, rows, force).returning(literal_column("xmax = 0"))
+            written = [is_insert for (is_insert,) in db.execute(stmt)]
+            inserted = sum(written)
+            updated = len(written) - inserted
+        else:
+            # Every row binds a parameter per column, at most
+            size = batch_size_for(db, len(rows), len(Prospect.__table__.columns))
+            inserted = updated = 0
+            for start in range(0, len(rows), size):
+                batch = rows[start : start + size]
+                if existing is None:
+                    # Insert the new rows first, the upsert then only counts
+                    # updates. Both run under the write lock of the first one.
+                    inserted += db.execute(cls._insert_new(db, batch)).rowcount
+                updated += db.execute(cls._upsert(db, batch, force)).rowcount
+            if existing is not None:
+                inserted = len(rows) - len(existing)
+                # The upsert counted the inserted rows too
+                updated -= inserted
+        if inserted or updated:
+            UserCrud.record_changes(db, user_id, prospects_total=inserted)
+        if commit:
+            db.commit()
+        return inserted, updated
 
     @classmethod
-    def get_file_prospects_done(cls, db: Session, file_id: int) -> int:
-        return db.query(Prospect).filter(Prospect.file_id == file_id).count()
+    def _insert_new(cls, db: Session, rows: list):
+        """The INSERT ... ON CONFLICT DO NOTHING statement of [rows]"""
+        return (
+            upsert_insert(db, Prospect.__table__)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[Prospect.user_id, Prospect.email])
+        )
+
+    @classmethod
+    def _upsert(cls, db: Session, rows: list, force: bool):
+        """The INSERT ... ON CONFLICT (user_id, email) statement of [rows]"""
+        stmt = upsert_insert(db, Prospect.__table__).values(rows)
+        later_row = and_(
+            Prospect.file_id == stmt.excluded.file_id,
+            Prospect.file_row < stmt.excluded.file_row,
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=[Prospect.user_id, Prospect.email],
+            set_={
+                "first_name": stmt.excluded.first_name,
+                "last_name": stmt.excluded.last_name,
+                "file_id": stmt.excluded.file_id,
+                "file_row": stmt.excluded.file_row,
+                "updated_at": func.now(),
+            },
+            where=(
+                or_(Prospect.file_id.is_distinct_from(stmt.excluded.file_id), later_row)
+                if force
+                else later_row
+            ),
+        )
+
+    @classmethod
+    def iter_user_emails(
+        cls, db: Session, user_id: int, file_id: int
+    ) -> Iterator[Tuple[str, bool]]:
+        """Stream (email, comes from file_id) for all of the user's prospects"""
+        return (
+            db.query(Prospect.email, Prospect.file_id == file_id)
+            .filter(Prospect.user_id == user_id)
+            .yield_per(STREAM_BATCH_SIZE)
+        )
+
+    @classmethod
+    def get_user_prospects_total(cls, db: Session, user_id: int) -> int:
+        return UserCrud.get_total(db, user_id, "prospects_total")
 
     @classmethod
     def create_prospect(
@@ -77,19 +254,7 @@ class ProspectCrud:
             user_id=user_id,
         )
         db.add(prospect)
+        UserCrud.record_changes(db, user_id, prospects_total=1)
         db.commit()
         db.refresh(prospect)
         return prospect
-
-    @classmethod
-    def validate_prospect_ids(
-        cls, db: Session, user_id: int, unvalidated_prospect_ids: Set[int]
-    ) -> Set[int]:
-        res = (
-            db.query(Prospect.id)
-            .filter(
-                Prospect.user_id == user_id, Prospect.id.in_(unvalidated_prospect_ids)
-            )
-            .all()
-        )
-        return {row.id for row in res}
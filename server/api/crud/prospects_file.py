@@ -1,7 +1,15 @@
-from typing import Union
+from typing import Dict, List, Optional, Union
 from sqlalchemy.orm.session import Session
 from api import schemas
 from api.models import ProspectsFile
+from .jobs import (
+    claim_next_job,
+    get_processing_jobs,
+    requeue_job,
+    resume_job,
+    save_job_progress,
+    update_job_state,
+)
 
 
 class ProspectsFileCrud:
@@ -19,12 +27,95 @@ class ProspectsFileCrud:
         return file
 
     @classmethod
-    def update_file_state(cls, db: Session, file_id: int, status: str):
+    def update_file_state(
+        cls, db: Session, file_id: int, status: str, worker_id: Optional[str] = None
+    ) -> int:
+        """Set the file's status, only while worker_id holds its claim if given"""
+        return update_job_state(db, ProspectsFile, file_id, status, worker_id)
+
+    @classmethod
+    def get_file_by_id(cls, db: Session, file_id: int) -> Union[ProspectsFile, None]:
+        return db.query(ProspectsFile).filter(ProspectsFile.id == file_id).one_or_none()
+
+    @classmethod
+    def claim_next_file(
+        cls, db: Session, worker_id: str, lease_seconds: int, max_attempts: int
+    ) -> Union[ProspectsFile, None]:
+        """Claim the oldest queued import, or one whose worker stopped
+        heartbeating, and lease it to worker_id
+        """
+        file_id = claim_next_job(
+            db, ProspectsFile, worker_id, lease_seconds, max_attempts
+        )
+        if file_id is None:
+            return None
+        return cls.get_file_by_id(db, file_id)
+
+    @classmethod
+    def set_rejected_file(cls, db: Session, file_id: int, rejected_file_name: str):
         db.query(ProspectsFile).filter(ProspectsFile.id == file_id).update(
-            {ProspectsFile.status: status}, synchronize_session="fetch"
+            {ProspectsFile.rejected_file_name: rejected_file_name},
+            synchronize_session=False,
         )
         db.commit()
 
     @classmethod
-    def get_file_by_id(cls, db: Session, file_id: int) -> Union[ProspectsFile, None]:
-        return db.query(ProspectsFile).filter(ProspectsFile.id == file_id).one_or_none()
+    def save_progress(
+        cls,
+        db: Session,
+        file_id: int,
+        worker_id: str,
+        lease_seconds: int,
+        counters: Dict[str, int],
+        checkpoint: Optional[Dict[str, int]] = None,
+    ) -> bool:
+        """Record the progress made by the chunk pending in the session, extend
+        the lease held by worker_id, and commit both together.
+
+        [counters] maps the *_rows counter columns to the chunk's increments and
+        [checkpoint] the checkpoint_* columns to their new values.
+        Returns False (and rolls back) if the claim was lost.
+        """
+        return save_job_progress(
+            db, ProspectsFile, file_id, worker_id, lease_seconds, counters, checkpoint
+        )
+
+    @classmethod
+    def reset_progress(cls, db: Session, file_id: int):
+        """Clear the checkpoint and counters of an import starting over"""
+        db.query(ProspectsFile).filter(ProspectsFile.id == file_id).update(
+            {
+                ProspectsFile.checkpoint_offset: 0,
+                ProspectsFile.checkpoint_row: 0,
+                ProspectsFile.checkpoint_rejected_offset: 0,
+                ProspectsFile.processed_rows: 0,
+                ProspectsFile.inserted_rows: 0,
+                ProspectsFile.updated_rows: 0,
+                ProspectsFile.skipped_rows: 0,
+                ProspectsFile.rejected_rows: 0,
+                ProspectsFile.rejected_file_name: None,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+
+    @classmethod
+    def get_processing_files(
+        cls, db: Session, claimed_by_prefix: str
+    ) -> List[ProspectsFile]:
+        """Imports in progress claimed by workers whose id starts with the prefix"""
+        return get_processing_jobs(db, ProspectsFile, claimed_by_prefix)
+
+    @classmethod
+    def requeue_file(cls, db: Session, file_id: int) -> bool:
+        """Put an interrupted import back in the queue. It keeps its checkpoint,
+        so the next worker resumes where the previous one stopped.
+        """
+        return requeue_job(db, ProspectsFile, file_id)
+
+    @classmethod
+    def resume_file(cls, db: Session, file_id: int) -> bool:
+        """Queue a failed import, or one whose worker stopped heartbeating, to
+        resume from its checkpoint. Returns False if the file is not resumable.
+        """
+        return resume_job(db, ProspectsFile, file_id)
@@ -1,11 +1,23 @@
-from typing import Union
+from typing import Optional, Union
 from fastapi.param_functions import Depends
 from pydantic.networks import EmailStr
+from sqlalchemy.engine import Dialect
+from sqlalchemy.orm import Query
 from sqlalchemy.orm.session import Session
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.expression import TextClause, or_, select, text
+from sqlalchemy.sql.functions import func
 from api import schemas
 from api.core import security
+from api.core.config import settings
 from api.dependencies.db import get_db
-from api.models import User
+from api.models import Campaign, Prospect, User
+
+# Maintained total column -> the rows it counts
+TOTALS = {
+    "prospects_total": (Prospect, Prospect.user_id),
+    "campaigns_total": (Campaign, Campaign.user_id),
+}
 
 
 class UserCrud:
@@ -15,13 +27,107 @@ class UserCrud:
         return db.query(User).filter(User.email == email.lower()).one_or_none()
 
     @classmethod
-    def create_user(cls, db: Session, data: schemas.UserCreate) -> User:
-        """Create a user"""
+    def create_user(
+        cls,
+        db: Session,
+        data: schemas.UserCreate,
+        password_digest: Optional[str] = None,
+    ) -> User:
+        """Create a user, hashing its password unless [password_digest] is given"""
         user = User(
             email=data.email.lower(),
-            password_digest=security.get_password_hash(data.password),
+            password_digest=password_digest
+            or security.get_password_hash(data.password),
         )
         db.add(user)
         db.commit()
         db.refresh(user)
         return user
+
+    @classmethod
+    def set_password_digest(cls, db: Session, user: User, password_digest: str):
+        user.password_digest = password_digest
+        db.commit()
+        db.refresh(user)
+
+    @classmethod
+    def record_changes(cls, db: Session, user_id: int, **deltas: int):
+        """Bump the user's data_version and adjust its maintained totals
+        (prospects_total=2, ...), in the caller's transaction so they commit or
+        roll back with the rows
+        """
+        values = {User.data_version: User.data_version + 1}
+        if settings.TOTALS_MODE != "estimated":
+            values.update(
+                {
+                    getattr(User, name): getattr(User, name) + delta
+                    for name, delta in deltas.items()
+                    if delta
+                }
+            )
+        db.query(User).filter(User.id == user_id).update(
+            values, synchronize_session=False
+        )
+
+    @classmethod
+    def get_data_version(cls, db: Session, user_id: int) -> int:
+        return db.query(User.data_version).filter(User.id == user_id).scalar()
+
+    @classmethod
+    def get_total(cls, db: Session, user_id: int, name: str) -> int:
+        """Get one of the user's totals, the way settings.TOTALS_MODE says"""
+        model, owner = TOTALS[name]
+        rows = db.query(model).filter(owner == user_id)
+        if settings.TOTALS_MODE == "exact":
+            return rows.count()
+        if settings.TOTALS_MODE == "estimated":
+            estimate = cls._estimate_rows(db, rows)
+            if estimate is not None and estimate >= settings.TOTALS_ESTIMATE_MIN:
+                return estimate
+            return rows.count()
+        return db.query(getattr(User, name)).filter(User.id == user_id).scalar() or 0
+
+    @classmethod
+    def _estimate_rows(cls, db: Session, rows: Query) -> Optional[int]:
+        """Row count the Postgres planner expects for a query, None elsewhere"""
+        dialect = db.get_bind().dialect
+        if dialect.name != "postgresql":
+            return None
+        plan = db.execute(cls.explain_statement(dialect, rows.statement)).scalar()
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @classmethod
+    def explain_statement(cls, dialect: Dialect, statement: Select) -> TextClause:
+        """EXPLAIN (FORMAT JSON) of a statement, its parameters inlined"""
+        statement = statement.compile(
+            dialect=dialect, compile_kwargs={"literal_binds": True}
+        )
+        return text(f"EXPLAIN (FORMAT JSON) {statement}")
+
+    @classmethod
+    def reconcile_totals(cls, db: Session, user_id: Optional[int] = None) -> int:
+        """Recount the maintained totals (of every user by default) and repair
+        the ones that drifted. Returns the number of users repaired.
+        """
+        counts = {
+            name: select(func.count())
+            .select_from(model)
+            .where(owner == User.id)
+            .scalar_subquery()
+            for name, (model, owner) in TOTALS.items()
+        }
+        query = db.query(User).filter(
+            or_(*(getattr(User, name) != count for name, count in counts.items()))
+        )
+        if user_id is not None:
+            query = query.filter(User.id == user_id)
+        # A new data version, so cached listings pick up the repaired totals
+        repaired = query.update(
+            {
+                User.data_version: User.data_version + 1,
+                **{getattr(User, name): count for name, count in counts.items()},
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+        return repaired
@@ -1,11 +1,97 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.session import Session
 
-from dotenv import dotenv_values
+from api.core.config import settings
+from api.core.constants import SQLITE_MAX_VARIABLES
+from api.core.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
 
-config = dotenv_values(".env")
 
-engine = create_engine(config.get("DATABASE_URL"))
+def engine_options(poolclass) -> dict:
+    """Pool options of both engines, from the DB_POOL_* settings. SQLite file
+    databases get a QueuePool too, so pool metrics exist in development.
+    """
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+# The single sync engine of the process, shared by the API, the import worker
+# and the scripts. SQLite connections are shared between the threadpool workers
+connect_args = (
+    {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+)
+engine = create_engine(
+    settings.DATABASE_URL,
+    connect_args=connect_args,
+    **engine_options(InstrumentedQueuePool),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+# Async drivers of the request path; the importer keeps the sync engine
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    """The database URL with the dialect's async driver instead of its sync one"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise NotImplementedError(f"No async driver is configured for {backend}")
+    return str(url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}"))
+
+
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    **engine_options(InstrumentedAsyncQueuePool),
+)
+AsyncSessionLocal = sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autocommit=False,
+    autoflush=False,
+    # Rows stay readable once the request's transaction ends
+    expire_on_commit=False,
+)
+
+
+def init_process():
+    """Process pool initializer: leave the pooled connections inherited from
+    the parent process to the parent
+    """
+    engine.dispose(close=False)
+
+
+def upsert_insert(db: Session, table):
+    """Return an INSERT construct for the session's dialect that supports
+    ON CONFLICT clauses (Postgres and SQLite)
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"ON CONFLICT is not supported for {dialect}")
+
+
+def batch_size_for(
+    db: Session, batch_size: int, params_per_row: int, extra_params: int = 0
+) -> int:
+    """[batch_size] capped so a statement of that many rows, [params_per_row]
+    bound parameters each plus [extra_params], fits SQLite's parameter limit
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return batch_size
+    return max(
+        1, min(batch_size, (SQLITE_MAX_VARIABLES - extra_params) // params_per_row)
+    )
@@ -1,6 +1,7 @@
+from typing import Optional
+
 from fastapi import Depends
 from fastapi.security.utils import get_authorization_scheme_param
-from sqlalchemy.orm.session import Session
 from starlette.requests import Request
 from pydantic.networks import EmailStr
 
@@ -9,8 +10,9 @@ from jose import JWTError, ExpiredSignatureError
 from api import schemas
 from api.core import security
 from api.core.exceptions import CredentialsException
-from api.crud.user import UserCrud
-from api.dependencies.db import get_db
+from api.core.user_cache import user_cache
+from api.crud.aio import AsyncUserCrud
+from api.database import AsyncSessionLocal
 
 
 def get_token(request: Request):
@@ -19,20 +21,33 @@ def get_token(request: Request):
     return header_param
 
 
-def get_current_user(token: str = Depends(get_token), db: Session = Depends(get_db)):
-    """Decode the provided jwt and extract the user using the [sub] field."""
+async def get_current_user(token: str = Depends(get_token)) -> Optional[schemas.User]:
+    """Decode the provided jwt and extract the user using the [sub] field.
+    Users of recently seen tokens come from the user cache instead.
+
+    The user is read in a session of its own, closed before the endpoint runs,
+    so sync endpoints don't hold an async connection for the whole request.
+    A shared (Redis) user cache is called from the threadpool.
+    """
     if not token:
         return None
+    user = await user_cache.run(user_cache.get, token)
+    if user is not None:
+        return user
     try:
         payload = security.decode_token(token)
         email = payload.sub
         if email is None:
             # Something wrong with the token
             raise CredentialsException
+        generation = await user_cache.run(user_cache.generation, email)
         # Get user from database
-        user = UserCrud.get_user_by_email(db, email)
+        async with AsyncSessionLocal() as db:
+            user = await AsyncUserCrud.get_user_by_email(db, email)
         if user is None:
             raise CredentialsException
+        user = schemas.User.from_orm(user)
+        await user_cache.run(user_cache.set, token, user, payload.exp, generation)
         return user
     except (JWTError, ExpiredSignatureError):
         # Something wrong with the token
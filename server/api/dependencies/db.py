@@ -1,5 +1,5 @@
-from typing import Generator
-from api.database import SessionLocal
+from typing import AsyncGenerator, Generator
+from api.database import AsyncSessionLocal, SessionLocal
 
 
 def get_db() -> Generator:
@@ -9,3 +9,11 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator:
+    """Yield a SQLAlchemy asyncio session, for async endpoints: waiting on the
+    database holds a pooled connection but no threadpool slot
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,8 @@
+from typing import Optional
+
+from api.core.pagination import Cursor, decode_cursor
+
+
+def get_cursor(cursor: Optional[str] = None) -> Optional[Cursor]:
+    """Decode the opaque [cursor] query parameter of keyset paginated listings"""
+    return decode_cursor(cursor) if cursor is not None else None
@@ -3,3 +3,4 @@ from .prospects import Prospect
 from .campaigns import Campaign
 from .campaign_prospects import CampaignProspect
 from .prospects_files import ProspectsFile
+from .campaign_assignments import CampaignAssignment
@@ -0,0 +1,48 @@
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql.functions import func
+from sqlalchemy.sql.schema import Column, ForeignKey
+from sqlalchemy.sql.sqltypes import JSON, BigInteger, DateTime, Integer, String
+
+from api.database import Base
+
+
+class CampaignAssignment(Base):
+    """Bulk additions of prospects to campaigns, doubling as their job queue"""
+
+    __tablename__ = "campaign_assignments"
+
+    # INTEGER on SQLite so the column aliases the rowid and autoincrements
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    status = Column(String, nullable=False, server_default="created", index=True)
+    user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
+
+    # Target campaigns, and the prospect search filters selecting the prospects
+    campaign_ids = Column(JSON, nullable=False)
+    selector = Column(JSON, nullable=False)
+
+    # Prospects are walked in id order; an interrupted assignment resumes after
+    # the last id of its last committed batch
+    checkpoint_prospect_id = Column(BigInteger, nullable=False, server_default="0")
+
+    # Prospects matching the selector when the assignment started, then counters
+    # maintained in the same transaction as each batch
+    total_rows = Column(Integer, nullable=True)
+    processed_rows = Column(Integer, nullable=False, server_default="0")
+    added_rows = Column(Integer, nullable=False, server_default="0")
+
+    # Worker claim
+    claimed_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, server_default="0")
+
+    user = relationship("User", foreign_keys=[user_id])
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"{self.id} | {self.status}"
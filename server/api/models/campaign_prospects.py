@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.functions import func
-from sqlalchemy.sql.schema import Column, ForeignKey
+from sqlalchemy.sql.schema import Column, ForeignKey, UniqueConstraint
 from sqlalchemy.sql.sqltypes import BigInteger, DateTime, Integer
 
 from api.database import Base
@@ -10,8 +10,22 @@ class CampaignProspect(Base):
     """Links Prospects to Campaigns"""
 
     __tablename__ = "campaigns_prospects"
+    __table_args__ = (
+        # A prospect is in a campaign once; also serves membership lookups, e.g.
+        # the prospect search filter
+        UniqueConstraint(
+            "campaign_id",
+            "prospect_id",
+            name="uq_campaigns_prospects_campaign_id_prospect_id",
+        ),
+    )
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # INTEGER on SQLite so the column aliases the rowid and autoincrements
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
     campaign_id = Column(BigInteger, ForeignKey("campaigns.id"))
     prospect_id = Column(BigInteger, ForeignKey("prospects.id"))
 
@@ -1,6 +1,7 @@
+from sqlalchemy import DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.functions import func
-from sqlalchemy.sql.schema import Column, ForeignKey
+from sqlalchemy.sql.schema import Column, ForeignKey, Index
 from sqlalchemy.sql.sqltypes import BigInteger, DateTime, Integer, String
 
 from api.database import Base
@@ -10,10 +11,24 @@ class Campaign(Base):
     """Campaigns Table"""
 
     __tablename__ = "campaigns"
-
-    id = Column(BigInteger, primary_key=True, autoincrement=True, unique=True)
-    name = Column(String, primary_key=True)
-    user_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True)
+    __table_args__ = (
+        # Sort key of the keyset paginated listing
+        Index("ix_campaigns_user_id_id", "user_id", "id"),
+        Index(
+            "ix_campaigns_user_id_prospects_count", "user_id", "prospects_count", "id"
+        ),
+    )
+
+    # INTEGER on SQLite so the column aliases the rowid and autoincrements
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    name = Column(String, nullable=False)
+    # Number of campaigns_prospects links, kept up to date by CampaignCrud
+    prospects_count = Column(Integer, nullable=False, server_default="0")
+    user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
 
     user = relationship("User", back_populates="campaigns", foreign_keys=[user_id])
 
@@ -22,3 +37,18 @@ class Campaign(Base):
 
     def __repr__(self):
         return f"{self.id} | {self.name}"
+
+
+# Trigram index for the name search, Postgres only (other databases are served
+# by an in-process index, see api/core/search.py)
+for statement in (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    "CREATE INDEX IF NOT EXISTS ix_campaigns_user_id_name_trgm "
+    "ON campaigns USING gin (user_id, name gin_trgm_ops)",
+):
+    event.listen(
+        Campaign.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
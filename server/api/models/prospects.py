@@ -1,22 +1,64 @@
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import column
 from sqlalchemy.sql.functions import func
-from sqlalchemy.sql.schema import Column, ForeignKey
+from sqlalchemy.sql.schema import Column, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql.sqltypes import BigInteger, DateTime, Integer, String
 
 from api.database import Base
 
 
+def email_domain_default(context) -> str:
+    return context.get_current_parameters()["email"].rsplit("@", 1)[-1]
+
+
 class Prospect(Base):
     """Prospects Table"""
 
     __tablename__ = "prospects"
+    __table_args__ = (
+        # Conflict target for the bulk upsert done by the CSV import
+        UniqueConstraint("user_id", "email", name="uq_prospects_user_id_email"),
+        # Sort key of the keyset paginated listing
+        Index("ix_prospects_user_id_id", "user_id", "id"),
+        # Filters of the prospect search, see ProspectCrud.search_prospects
+        Index(
+            "ix_prospects_user_id_email_pattern",
+            "user_id",
+            "email",
+            postgresql_ops={"email": "text_pattern_ops"},
+        ),
+        Index("ix_prospects_user_id_email_domain", "user_id", "email_domain", "id"),
+        Index("ix_prospects_user_id_file_id", "user_id", "file_id", "id"),
+        Index(
+            "ix_prospects_user_id_first_name",
+            "user_id",
+            func.lower(column("first_name")).label("first_name_lower"),
+            postgresql_ops={"first_name_lower": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_prospects_user_id_last_name",
+            "user_id",
+            func.lower(column("last_name")).label("last_name_lower"),
+            postgresql_ops={"last_name_lower": "text_pattern_ops"},
+        ),
+    )
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True, unique=True)
-    email = Column(String, primary_key=True, nullable=False)
-    first_name = Column(String, index=True, nullable=False)
-    last_name = Column(String, index=True, nullable=False)
+    # INTEGER on SQLite so the column aliases the rowid and autoincrements
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    email = Column(String, nullable=False)
+    # Filled in from the email on insert, for the search by domain
+    email_domain = Column(String, default=email_domain_default, nullable=True)
+    first_name = Column(String, nullable=False)
+    last_name = Column(String, nullable=False)
     file_id = Column(Integer, ForeignKey("prospects_files.id"), nullable=True)
-    user_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True)
+    # Row number in that file, lets the last row win among duplicate emails
+    # even when parts of the file are imported concurrently
+    file_row = Column(Integer, nullable=True)
+    user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
 
     user = relationship("User", back_populates="prospects", foreign_keys=[user_id])
     prospects_file = relationship(
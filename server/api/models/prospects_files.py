@@ -1,22 +1,59 @@
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import false, true
 from sqlalchemy.sql.functions import func
 from sqlalchemy.sql.schema import Column, ForeignKey
-from sqlalchemy.sql.sqltypes import BigInteger, DateTime, Integer, String
+from sqlalchemy.sql.sqltypes import BigInteger, Boolean, DateTime, Integer, String
 
 from api.database import Base
 
 
 class ProspectsFile(Base):
-    """Prospects files table"""
+    """Prospects files table, doubling as the import job queue"""
 
     __tablename__ = "prospects_files"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True, unique=True)
+    # INTEGER on SQLite so the column aliases the rowid and autoincrements
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
     original_file_name = Column(String, nullable=False)
     saved_file_name = Column(String, nullable=False)
     total_rows = Column(Integer, nullable=False)
-    status = Column(String, nullable=False, server_default="created")
-    user_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True)
+    content_hash = Column(String, nullable=True)
+    status = Column(String, nullable=False, server_default="created", index=True)
+    user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
+
+    # Rows that failed validation, written to a CSV next to the upload
+    rejected_file_name = Column(String, nullable=True)
+
+    # Progress of the import as of the last committed chunk; an interrupted
+    # import resumes from here
+    checkpoint_offset = Column(BigInteger, nullable=False, server_default="0")
+    checkpoint_row = Column(Integer, nullable=False, server_default="0")
+    checkpoint_rejected_offset = Column(BigInteger, nullable=False, server_default="0")
+
+    # Counters maintained in the same transaction as each chunk
+    processed_rows = Column(Integer, nullable=False, server_default="0")
+    inserted_rows = Column(Integer, nullable=False, server_default="0")
+    updated_rows = Column(Integer, nullable=False, server_default="0")
+    skipped_rows = Column(Integer, nullable=False, server_default="0")
+    rejected_rows = Column(Integer, nullable=False, server_default="0")
+
+    # Import options
+    email_index = Column(Integer, nullable=False)
+    first_name_index = Column(Integer, nullable=False, server_default="-1")
+    last_name_index = Column(Integer, nullable=False, server_default="-1")
+    force = Column(Boolean, nullable=False, server_default=false())
+    has_headers = Column(Boolean, nullable=False, server_default=true())
+    parallel = Column(Boolean, nullable=False, server_default=false())
+
+    # Worker claim
+    claimed_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, server_default="0")
 
     user = relationship(
         "User", back_populates="prospects_files", foreign_keys=[user_id]
@@ -1,7 +1,7 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.functions import func
 from sqlalchemy.sql.schema import Column
-from sqlalchemy.sql.sqltypes import BigInteger, DateTime, String
+from sqlalchemy.sql.sqltypes import BigInteger, DateTime, Integer, String
 
 from api.database import Base
 
@@ -11,9 +11,18 @@ class User(Base):
 
     __tablename__ = "users"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    # INTEGER on SQLite so the column aliases the rowid and autoincrements
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"), primary_key=True, index=True
+    )
     email = Column(String, unique=True, index=True, nullable=False)
     password_digest = Column(String, unique=True, index=True, nullable=False)
+    # Row totals of the listings, kept up to date by the writes (see UserCrud)
+    prospects_total = Column(BigInteger, nullable=False, server_default="0")
+    campaigns_total = Column(BigInteger, nullable=False, server_default="0")
+    # Bumped by every write to the user's prospects or campaigns, the ETag of
+    # the listings
+    data_version = Column(BigInteger, nullable=False, server_default="0")
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
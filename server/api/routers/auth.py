@@ -3,6 +3,7 @@ from fastapi import status
 from sqlalchemy.orm.session import Session
 
 from api.core import security
+from api.core.exceptions import PasswordHashingBusy, PasswordHashingBusyException
 from api.schemas.auth import LoginRequestBody, LoginResponse
 from api.dependencies.db import get_db
 
@@ -13,7 +14,10 @@ router = APIRouter(prefix="/api", tags=["auth"])
 async def login(form_data: LoginRequestBody, db: Session = Depends(get_db)):
     """User will attempt to authenticate with a email/password flow"""
 
-    user = await security.authenticate_user(db, form_data.email, form_data.password)
+    try:
+        user = await security.authenticate_user(db, form_data.email, form_data.password)
+    except PasswordHashingBusy:
+        raise PasswordHashingBusyException
     if not user:
         # Wrong email or password provided
         raise HTTPException(
@@ -1,49 +1,116 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, status, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
+from fastapi.responses import ORJSONResponse
 from starlette.responses import JSONResponse
 from starlette.status import HTTP_401_UNAUTHORIZED
 
 from api import schemas
 from api.dependencies.auth import get_current_user
+from api.core.config import settings
 from api.core.constants import DEFAULT_PAGE, DEFAULT_PAGE_SIZE
-from api.crud import CampaignCrud, ProspectCrud
-from api.dependencies.db import get_db
+from api.crud import CampaignAssignmentCrud, CampaignCrud
+from api.crud.aio import AsyncCampaignCrud, AsyncUserCrud
+from api.dependencies.db import get_async_db, get_db
+from api.models import CampaignAssignment
+from api.dependencies.pagination import get_cursor
+from api.core.assignments import assignment_progress
+from api.core.etag import content_etag, not_modified, version_etag, with_etag
+from api.core.pagination import Cursor
+from api.core.responses import page_response, rows_content
 
 router = APIRouter(prefix="/api", tags=["campaigns"])
 
 
 @router.get("/campaigns", response_model=schemas.CampaignResponse)
-def get_campaign_page(
+async def get_campaign_page(
+    request: Request,
     current_user: schemas.User = Depends(get_current_user),
     page: int = DEFAULT_PAGE,
     page_size: int = DEFAULT_PAGE_SIZE,
-    db: Session = Depends(get_db),
+    cursor: Optional[Cursor] = Depends(get_cursor),
+    sort: schemas.CampaignSort = schemas.CampaignSort.id,
+    descending: bool = False,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Get a single page of campaigns"""
+    """Get a single page of campaigns, with their prospects count"""
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Please log in"
         )
-    campaigns = CampaignCrud.get_users_campaign(db, current_user.id, page, page_size)
-    total = CampaignCrud.get_user_campaign_total(db, current_user.id)
-    return {"campaigns": campaigns, "size": len(campaigns), "total": total}
+    data_version = await AsyncUserCrud.get_data_version(db, current_user.id)
+    etag = version_etag(current_user.id, data_version)
+    response = not_modified(request, etag)
+    if response:
+        return response
+    result = await AsyncCampaignCrud.get_users_campaign(
+        db, current_user.id, page, page_size, cursor, sort, descending
+    )
+    total = await AsyncCampaignCrud.get_user_campaign_total(db, current_user.id)
+    return with_etag(page_response("campaigns", result, total=total), etag)
 
 
 @router.get("/campaigns/search", response_model=schemas.CampaignSearchResponse)
-def search_campaigns(
+async def search_campaigns(
+    request: Request,
     query: str,
+    limit: int = settings.CAMPAIGN_SEARCH_LIMIT,
     current_user: schemas.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Search campaigns by name"""
+    """Search campaigns by name, best matches first"""
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Please log in"
         )
-    campaigns = CampaignCrud.get_user_campaign_from_name_fragment(
-        db, current_user.id, query
+    data_version = await AsyncUserCrud.get_data_version(db, current_user.id)
+    etag = version_etag(current_user.id, data_version)
+    response = not_modified(request, etag)
+    if response:
+        return response
+    campaigns = await AsyncCampaignCrud.get_user_campaign_from_name_fragment(
+        db, current_user.id, query, limit
+    )
+    return with_etag(ORJSONResponse({"campaigns": rows_content(campaigns)}), etag)
+
+
+@router.get(
+    "/campaigns/{campaign_id}/prospects",
+    response_model=schemas.CampaignProspectsResponse,
+)
+async def get_campaign_prospects(
+    request: Request,
+    campaign_id: int,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[Cursor] = Depends(get_cursor),
+    current_user: schemas.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get a single page of the prospects of a campaign. Two queries whatever
+    the size of the campaign: its header (owner, count, data version), then
+    the page.
+    """
+    if not current_user:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Please log in")
+
+    header = await AsyncCampaignCrud.get_campaign_header(db, campaign_id)
+    if not header or header.user_id != current_user.id:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            detail=f"Campaign with id {campaign_id} does not exist",
+        )
+    etag = version_etag(current_user.id, header.data_version)
+    response = not_modified(request, etag)
+    if response:
+        return response
+    result = await AsyncCampaignCrud.get_campaign_prospects(
+        db, campaign_id, page_size, cursor
+    )
+    return with_etag(
+        page_response("prospects", result, total=header.prospects_count), etag
     )
-    return {"campaigns": campaigns}
 
 
 @router.post(
@@ -72,17 +139,92 @@ def add_prospects_to_campaign(
             detail=f"You do not have access to that campaign",
         )
 
-    # Get existing prospects for this campaign
-    existing_prospect_ids = CampaignCrud.get_existing_campaign_prospects(
-        db, campaign_id
+    # Only the user's prospects not in the campaign yet are added
+    new_prospect_ids = CampaignCrud.add_prospects_to_campaign(
+        db, campaign.id, current_user.id, data.prospect_ids
     )
 
-    data.prospect_ids = ProspectCrud.validate_prospect_ids(
-        db, current_user.id, data.prospect_ids
-    )
+    return JSONResponse({"prospect_ids": new_prospect_ids}, 200)
+
+
+@router.post(
+    "/campaigns/assignments",
+    response_model=schemas.CampaignAssignmentResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def create_campaign_assignment(
+    data: schemas.CampaignAssignmentCreate,
+    current_user: schemas.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Add all the prospects matching a selector (a file, another campaign or
+    search filters) to one or more campaigns. The assignment is queued and run
+    in batches by the worker (worker.py); follow it from its progress.
+    """
+    if not current_user:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Please log in")
+
+    campaign_ids = set(data.campaign_ids)
+    if data.selector.campaign_id is not None:
+        campaign_ids.add(data.selector.campaign_id)
+    for campaign_id in sorted(campaign_ids):
+        campaign = CampaignCrud.get_by_id(db, campaign_id)
+        if not campaign or campaign.user_id != current_user.id:
+            raise HTTPException(
+                status.HTTP_404_NOT_FOUND,
+                detail=f"Campaign with id {campaign_id} does not exist",
+            )
+
+    assignment = CampaignAssignmentCrud.create_assignment(db, current_user.id, data)
+    return {"result": "queued", "assignment_id": assignment.id}
+
+
+def get_user_assignment(
+    db: Session, id: int, current_user: schemas.User
+) -> CampaignAssignment:
+    if not current_user:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Please log in")
+
+    assignment = CampaignAssignmentCrud.get_by_id(db, id)
+    if not assignment or assignment.user_id != current_user.id:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            detail=f"Assignment with id {id} does not exist",
+        )
+    return assignment
 
-    # Add only valid/non-duplicate prospects
-    new_prospect_ids = data.prospect_ids - existing_prospect_ids
-    CampaignCrud.add_prospects_to_campaign(db, campaign_id, new_prospect_ids)
 
-    return JSONResponse({"prospect_ids": list(new_prospect_ids)}, 200)
+@router.get(
+    "/campaigns/assignments/{id}",
+    response_model=schemas.CampaignAssignmentProgressResponse,
+)
+def get_campaign_assignment_progress(
+    request: Request,
+    id: int,
+    current_user: schemas.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Check the progress of a campaign assignment"""
+    assignment = get_user_assignment(db, id, current_user)
+    content = assignment_progress(assignment)
+    etag = content_etag(content)
+    return not_modified(request, etag) or with_etag(ORJSONResponse(content), etag)
+
+
+@router.post(
+    "/campaigns/assignments/{id}/resume",
+    response_model=schemas.CampaignAssignmentResponse,
+)
+def resume_campaign_assignment(
+    id: int,
+    current_user: schemas.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Queue a failed or stalled assignment to continue after its last batch"""
+    assignment = get_user_assignment(db, id, current_user)
+    if not CampaignAssignmentCrud.resume_assignment(db, assignment.id):
+        raise HTTPException(
+            status.HTTP_409_CONFLICT,
+            detail=f"Assignment with id {id} is {assignment.status} and cannot be resumed",
+        )
+    return {"result": "queued", "assignment_id": assignment.id}
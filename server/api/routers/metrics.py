@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+
+from api.core.hashing import password_hasher
+from api.database import async_engine, engine
+
+router = APIRouter(prefix="/api", tags=["metrics"])
+
+
+@router.get("/metrics")
+def get_metrics():
+    """Load of the API process: password hashing queue and database
+    connection pools
+    """
+    return {
+        "password_hashing": password_hasher.stats(),
+        "database_pool": engine.pool.stats(),
+        "async_database_pool": async_engine.sync_engine.pool.stats(),
+    }
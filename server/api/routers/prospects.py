@@ -1,26 +1,129 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, status, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
 from api import schemas
 from api.dependencies.auth import get_current_user
 from api.core.constants import DEFAULT_PAGE, DEFAULT_PAGE_SIZE
-from api.crud import ProspectCrud
-from api.dependencies.db import get_db
+from api.crud import CampaignCrud
+from api.crud.aio import AsyncCampaignCrud, AsyncProspectCrud, AsyncUserCrud
+from api.database import SessionLocal
+from api.dependencies.db import get_async_db
+from api.models import Campaign
+from api.dependencies.pagination import get_cursor
+from api.core.export import EXPORT_FORMATS, export_prospects
+from api.core.etag import not_modified, version_etag, with_etag
+from api.core.pagination import Cursor
+from api.core.responses import page_response
 
 router = APIRouter(prefix="/api", tags=["prospects"])
 
 
 @router.get("/prospects", response_model=schemas.ProspectResponse)
-def get_prospects_page(
+async def get_prospects_page(
+    request: Request,
     current_user: schemas.User = Depends(get_current_user),
     page: int = DEFAULT_PAGE,
     page_size: int = DEFAULT_PAGE_SIZE,
-    db: Session = Depends(get_db),
+    cursor: Optional[Cursor] = Depends(get_cursor),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get a single page of prospects"""
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Please log in"
         )
-    prospects = ProspectCrud.get_users_prospects(db, current_user.id, page, page_size)
-    total = ProspectCrud.get_user_prospects_total(db, current_user.id)
-    return {"prospects": prospects, "size": len(prospects), "total": total}
+    data_version = await AsyncUserCrud.get_data_version(db, current_user.id)
+    etag = version_etag(current_user.id, data_version)
+    response = not_modified(request, etag)
+    if response:
+        return response
+    result = await AsyncProspectCrud.get_users_prospects(
+        db, current_user.id, page, page_size, cursor
+    )
+    total = await AsyncProspectCrud.get_user_prospects_total(db, current_user.id)
+    return with_etag(page_response("prospects", result, total=total), etag)
+
+
+def check_campaign_filter(
+    db: Session, filters: schemas.ProspectSearch, current_user: schemas.User
+):
+    if filters.campaign_id is not None:
+        campaign = CampaignCrud.get_by_id(db, filters.campaign_id)
+        check_campaign_owner(campaign, filters.campaign_id, current_user)
+
+
+async def check_campaign_filter_async(
+    db: AsyncSession, filters: schemas.ProspectSearch, current_user: schemas.User
+):
+    if filters.campaign_id is not None:
+        campaign = await AsyncCampaignCrud.get_by_id(db, filters.campaign_id)
+        check_campaign_owner(campaign, filters.campaign_id, current_user)
+
+
+def check_campaign_owner(
+    campaign: Optional[Campaign], campaign_id: int, current_user: schemas.User
+):
+    if not campaign or campaign.user_id != current_user.id:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            detail=f"Campaign with id {campaign_id} does not exist",
+        )
+
+
+@router.get("/prospects/search", response_model=schemas.ProspectSearchResponse)
+async def search_prospects(
+    request: Request,
+    filters: schemas.ProspectSearch = Depends(),
+    current_user: schemas.User = Depends(get_current_user),
+    page_size: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[Cursor] = Depends(get_cursor),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get a single page of the prospects matching the filters"""
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Please log in"
+        )
+    await check_campaign_filter_async(db, filters, current_user)
+    data_version = await AsyncUserCrud.get_data_version(db, current_user.id)
+    etag = version_etag(current_user.id, data_version)
+    response = not_modified(request, etag)
+    if response:
+        return response
+    result = await AsyncProspectCrud.search_prospects(
+        db, current_user.id, filters, page_size, cursor
+    )
+    return with_etag(page_response("prospects", result), etag)
+
+
+@router.get("/prospects/export", response_class=StreamingResponse)
+def export_prospects_file(
+    filters: schemas.ProspectSearch = Depends(),
+    format: schemas.ExportFormat = schemas.ExportFormat.csv,
+    gzip: bool = False,
+    current_user: schemas.User = Depends(get_current_user),
+):
+    """Download all the prospects matching the filters (the same as the search
+    ones) as CSV or NDJSON, optionally gzipped. The file is streamed as it is
+    read from the database, in a session of the export's own.
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Please log in"
+        )
+    # A session of its own: a request session would stay checked out until
+    # the export ends
+    with SessionLocal() as db:
+        check_campaign_filter(db, filters, current_user)
+    media_type, extension = EXPORT_FORMATS[format]
+    file_name = f"prospects.{extension}"
+    if gzip:
+        media_type, file_name = "application/gzip", file_name + ".gz"
+    return StreamingResponse(
+        export_prospects(current_user.id, filters, format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+    )
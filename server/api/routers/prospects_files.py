@@ -5,20 +5,29 @@ from fastapi import (
     Depends,
     UploadFile,
     File,
-    BackgroundTasks,
     Form,
+    Query,
+    Request,
 )
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from api import schemas
-import aiofiles
-from typing import Optional
-from csv import reader
+from typing import List, Optional
 from sqlalchemy.orm.session import Session
+import asyncio
+import json
+import os
 import uuid
 
-from api.crud import ProspectCrud, ProspectsFileCrud
+from api.crud import ProspectsFileCrud
+from api.database import SessionLocal
 from api.dependencies.db import get_db
 from api.dependencies.auth import get_current_user
-from api.core.utils import write_prospects
+from api.core.config import settings
+from api.core.etag import content_etag, not_modified, with_etag
+from api.core.progress import TERMINAL_STATUSES, file_progress, progress_broker
+from api.core.exceptions import InvalidUpload
+from api.core.uploads import SAVED_SUFFIXES, compression_of, save_upload
 
 router = APIRouter(prefix="/api", tags=["prospect_files"])
 
@@ -27,43 +36,43 @@ router = APIRouter(prefix="/api", tags=["prospect_files"])
     "/prospect_files/import", response_model=schemas.ProspectFileImportResponse
 )
 async def upload_prospects_file(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     email_index: int = Form(...),
     first_name_index: Optional[int] = Form(-1),
     last_name_index: Optional[int] = Form(-1),
     force: Optional[bool] = Form(False),
     has_headers: Optional[bool] = Form(True),
+    parallel: Optional[bool] = Form(False),
     current_user: schemas.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Upload the file and save it on server"""
+    """Upload the file and save it on server. The import itself is queued and
+    picked up by the import worker (worker.py).
+    """
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Please log in"
         )
 
-    new_filename = str(uuid.uuid4()) + ".csv"
-    async with aiofiles.open(new_filename, "wb") as out_file:
-        content = await file.read(1024)
-        while content:
-            await out_file.write(content)
-            content = await file.read(1024)
-
-    total_rows = 0
-    with open(new_filename, "r") as read_obj:
-        csv_reader = reader(read_obj)
-        if has_headers:
-            next(csv_reader)
-        for _ in csv_reader:
-            total_rows += 1
+    # Plain CSV, or CSV compressed with gzip, zip (single file) or zstd
+    new_filename = str(uuid.uuid4()) + SAVED_SUFFIXES[compression_of(file.filename)]
+    # Copy, count and hash in one pass off the event loop
+    try:
+        records, content_hash = await run_in_threadpool(
+            save_upload, file.file, new_filename, settings.UPLOAD_CHUNK_SIZE
+        )
+    except InvalidUpload as e:
+        os.remove(new_filename)
+        raise HTTPException(status_code=400, detail=str(e))
+    total_rows = max(records - 1, 0) if has_headers else records
 
     if total_rows == 0:
+        os.remove(new_filename)
         raise HTTPException(
             status_code=400, detail="No data found in the uploaded file"
         )
 
-    # create file object and save it to database.
+    # create file object and save it to database, which queues the import.
     file_in_db = ProspectsFileCrud.create_prospects_file(
         db,
         current_user.id,
@@ -71,36 +80,23 @@ async def upload_prospects_file(
             "original_file_name": file.filename,
             "saved_file_name": new_filename,
             "total_rows": total_rows,
+            "content_hash": content_hash,
+            "email_index": email_index,
+            "first_name_index": first_name_index,
+            "last_name_index": last_name_index,
+            "force": force,
+            "has_headers": has_headers,
+            "parallel": parallel,
         },
     )
-    background_tasks.add_task(
-        write_prospects,
-        file_in_db.id,
-        new_filename,
-        email_index,
-        first_name_index,
-        last_name_index,
-        force,
-        has_headers,
-        current_user,
-        db,
-    )
     return {
         "result": "File upload success. Waiting to be processed.",
         "file_id": file_in_db.id,
     }
 
 
-@router.get(
-    "/prospects_files/{id}/progress",
-    response_model=schemas.ProspectFileProgressResponse,
-)
-def get_file_progress(
-    id: int,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(get_current_user),
-):
-    """Check the progress of file"""
+def get_user_file(db: Session, id: int, current_user: schemas.User):
+    """Return the file with that id, provided it belongs to current_user"""
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Please log in"
@@ -117,5 +113,110 @@ def get_file_progress(
             status.HTTP_403_FORBIDDEN,
             detail=f"You do not have access to this file",
         )
-    done = ProspectCrud.get_file_prospects_done(db, id)
-    return {"total": file.total_rows, "done": done}
+    return file
+
+
+@router.get(
+    "/prospects_files/{id}/progress",
+    response_model=schemas.ProspectFileProgressResponse,
+)
+def get_file_progress(
+    request: Request,
+    id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user),
+):
+    """Check the progress of file, read from the counters kept by the importer"""
+    file = get_user_file(db, id, current_user)
+    content = file_progress(file)
+    etag = content_etag(content)
+    return not_modified(request, etag) or with_etag(ORJSONResponse(content), etag)
+
+
+@router.get("/prospects_files/progress/stream", response_class=StreamingResponse)
+def stream_files_progress(
+    ids: List[int] = Query(...),
+    current_user: schemas.User = Depends(get_current_user),
+):
+    """Server-sent events stream of the progress of one or more files. A
+    `status` event is sent on every status change and a `progress` event on
+    every other change; the stream ends once all files are finished or failed.
+    An `error` event ends the stream of a file whose progress can't be read.
+    """
+    # A session of its own: a request session would stay checked out until
+    # the stream ends
+    with SessionLocal() as db:
+        for id in ids:
+            get_user_file(db, id, current_user)
+
+    async def events():
+        pending = set(ids)
+        statuses = {}
+        async with progress_broker.subscribe(ids) as queue:
+            while pending:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), settings.PROGRESS_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                file_id = event["file_id"]
+                if "error" in event:
+                    yield f"event: error\ndata: {json.dumps(event)}\n\n"
+                    pending.discard(file_id)
+                    continue
+                kind = (
+                    "status" if statuses.get(file_id) != event["status"] else "progress"
+                )
+                statuses[file_id] = event["status"]
+                yield f"event: {kind}\ndata: {json.dumps(event)}\n\n"
+                if event["status"] in TERMINAL_STATUSES:
+                    pending.discard(file_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/prospects_files/{id}/resume", response_model=schemas.ProspectFileImportResponse
+)
+def resume_file_import(
+    id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user),
+):
+    """Queue a failed or stalled import to continue from its last checkpoint"""
+    file = get_user_file(db, id, current_user)
+    if not ProspectsFileCrud.resume_file(db, file.id):
+        raise HTTPException(
+            status.HTTP_409_CONFLICT,
+            detail=f"File with id {id} is {file.status} and cannot be resumed",
+        )
+    return {
+        "result": f"Import queued to resume after row {file.checkpoint_row}.",
+        "file_id": file.id,
+    }
+
+
+@router.get("/prospects_files/{id}/rejected", response_class=FileResponse)
+def get_rejected_rows(
+    id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user),
+):
+    """Download the rows of the file that failed validation, as CSV"""
+    file = get_user_file(db, id, current_user)
+    if not file.rejected_file_name:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            detail=f"File with id {id} has no rejected rows",
+        )
+    return FileResponse(
+        file.rejected_file_name,
+        media_type="text/csv",
+        filename=f"rejected-{file.original_file_name}",
+    )
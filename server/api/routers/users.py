@@ -1,9 +1,13 @@
 # FastAPI
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Request, status, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm.session import Session
 
 from api import schemas
 from api.core import security
+from api.core.etag import content_etag, not_modified, with_etag
+from api.core.exceptions import PasswordHashingBusy, PasswordHashingBusyException
 from api.crud import UserCrud
 from api.dependencies.auth import get_current_user
 from api.dependencies.db import get_db
@@ -12,7 +16,8 @@ router = APIRouter(prefix="/api", tags=["user"])
 
 
 @router.get("/user", response_model=schemas.User)
-def get_authenticated_user(
+async def get_authenticated_user(
+    request: Request,
     current_user: schemas.User = Depends(get_current_user),
 ):
     """Get the currently logged in user if the token is valid"""
@@ -20,16 +25,22 @@ def get_authenticated_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Please log in"
         )
-    return current_user
+    content = current_user.dict()
+    etag = content_etag(content)
+    return not_modified(request, etag) or with_etag(ORJSONResponse(content), etag)
 
 
 @router.post("/users", response_model=schemas.RegisterResponse)
-def create_user(data: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(data: schemas.UserCreate, db: Session = Depends(get_db)):
     """Create a new user record in the database and send a registration confirmation email"""
-    db_user = UserCrud.get_user_by_email(db, data.email)
+    db_user = await run_in_threadpool(UserCrud.get_user_by_email, db, data.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    new_user = UserCrud.create_user(db, data)
+    try:
+        password_digest = await security.hash_password(data.password)
+    except PasswordHashingBusy:
+        raise PasswordHashingBusyException
+    new_user = await run_in_threadpool(UserCrud.create_user, db, data, password_digest)
 
     token = security.create_access_token(data={"sub": new_user.email})
 
@@ -1,7 +1,11 @@
 from datetime import datetime
+from enum import Enum
 from typing import List, Optional, Set
 
 from pydantic import BaseModel
+from pydantic.types import conset
+
+from .prospects import Prospect, ProspectSearch
 
 
 class Campaign(BaseModel):
@@ -15,6 +19,11 @@ class Campaign(BaseModel):
         orm_mode = True
 
 
+class CampaignSort(str, Enum):
+    id = "id"
+    prospects_count = "prospects_count"
+
+
 class CampaignCreate(BaseModel):
     name: str
 
@@ -33,6 +42,19 @@ class CampaignResponse(BaseModel):
     campaigns: List[Campaign]
     size: int
     total: int
+    # Opaque cursors of the next and previous pages, None at either end
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+class CampaignProspectsResponse(BaseModel):
+    """One page of the prospects of a campaign"""
+
+    prospects: List[Prospect]
+    size: int
+    total: int
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
 
 
 class AddToCampaigns(BaseModel):
@@ -41,3 +63,27 @@ class AddToCampaigns(BaseModel):
 
 class AddToCampaignsResponse(BaseModel):
     prospect_ids: List[int]
+
+
+class CampaignAssignmentCreate(BaseModel):
+    """Add the prospects matching [selector] (e.g. a file_id, another campaign's
+    campaign_id, or search filters) to every campaign of [campaign_ids]
+    """
+
+    campaign_ids: conset(int, min_items=1)
+    selector: ProspectSearch = ProspectSearch()
+
+
+class CampaignAssignmentResponse(BaseModel):
+    result: str
+    assignment_id: int
+
+
+class CampaignAssignmentProgressResponse(BaseModel):
+    assignment_id: int
+    status: str
+    campaign_ids: List[int]
+    # None until a worker starts the assignment
+    total: Optional[int]
+    done: int
+    added: int
@@ -1,5 +1,6 @@
 from datetime import datetime
-from typing import List
+from enum import Enum
+from typing import List, Optional
 
 from pydantic import BaseModel
 from pydantic.networks import EmailStr
@@ -30,3 +31,31 @@ class ProspectResponse(BaseModel):
     prospects: List[Prospect]
     size: int
     total: int
+    # Opaque cursors of the next and previous pages, None at either end
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+class ProspectSearch(BaseModel):
+    """Filters of the prospect search, all optional and combined with AND"""
+
+    email_prefix: Optional[str]
+    email_domain: Optional[str]
+    # Prefix of the first or the last name, case insensitive
+    name_prefix: Optional[str]
+    file_id: Optional[int]
+    campaign_id: Optional[int]
+
+
+class ProspectSearchResponse(BaseModel):
+    """One page of the prospects matching a search"""
+
+    prospects: List[Prospect]
+    size: int
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 
 class ProspectsFile(BaseModel):
@@ -7,7 +8,14 @@ class ProspectsFile(BaseModel):
     original_file_name: str
     saved_file_name: str
     total_rows: int
+    content_hash: Optional[str]
+    rejected_file_name: Optional[str]
     status: str
+    processed_rows: int
+    inserted_rows: int
+    updated_rows: int
+    skipped_rows: int
+    rejected_rows: int
     created_at: datetime
 
     class Config:
@@ -23,8 +31,21 @@ class ProspectsFileCreate(BaseModel):
     original_file_name: str
     saved_file_name: str
     total_rows: int
+    content_hash: Optional[str]
+    email_index: int
+    first_name_index: int
+    last_name_index: int
+    force: bool
+    has_headers: bool
+    parallel: bool
 
 
 class ProspectFileProgressResponse(BaseModel):
+    file_id: int
+    status: str
     total: int
     done: int
+    inserted: int
+    updated: int
+    skipped: int
+    rejected: int
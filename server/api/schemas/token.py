@@ -1,6 +1,10 @@
+from typing import Optional
+
 from pydantic import BaseModel
 from pydantic.networks import EmailStr
 
 
 class Token(BaseModel):
     sub: EmailStr
+    # Expiration time (seconds since the epoch), absent from older tokens
+    exp: Optional[int]
@@ -0,0 +1,81 @@
+"""Compare the cost of a 100 prospects page through the ORM -> pydantic ->
+jsonable_encoder -> json chain, and through the column tuples -> orjson path
+the list endpoints use. Runs against an in-memory SQLite database:
+
+`python bench_serialization.py [pages]`
+"""
+
+import json
+import sys
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api import schemas
+from api.core.constants import MAX_PAGE_SIZE
+from api.core.responses import page_response
+from api.crud import ProspectCrud
+from api.database import Base
+from api.models import Prospect, User
+
+
+def seed(db):
+    db.add(User(id=1, email="bench@test.com", password_digest="-"))
+    db.add_all(
+        Prospect(
+            email=f"prospect{i}@mail.com",
+            first_name=f"John {i}",
+            last_name="D.",
+            user_id=1,
+        )
+        for i in range(MAX_PAGE_SIZE * 10)
+    )
+    db.commit()
+
+
+def orm_page(db) -> bytes:
+    """The path of the list endpoints before the fast one"""
+    prospects = (
+        db.query(Prospect)
+        .filter(Prospect.user_id == 1)
+        .order_by(Prospect.id)
+        .limit(MAX_PAGE_SIZE)
+        .all()
+    )
+    response = schemas.ProspectResponse(
+        prospects=prospects, size=len(prospects), total=MAX_PAGE_SIZE * 10
+    )
+    return json.dumps(
+        jsonable_encoder(response), ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+def fast_page(db) -> bytes:
+    page = ProspectCrud.get_users_prospects(db, 1, 0, MAX_PAGE_SIZE)
+    return page_response("prospects", page, total=MAX_PAGE_SIZE * 10).body
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    seed(db)
+
+    # Same prospects either way (the fast path adds the cursors)
+    fast = json.loads(fast_page(db))
+    assert json.loads(orm_page(db))["prospects"] == fast["prospects"]
+
+    results = {}
+    for name, run in (
+        ("orm + pydantic + json", orm_page),
+        ("tuples + orjson", fast_page),
+    ):
+        db.expunge_all()
+        seconds = min(timeit.repeat(lambda: run(db), number=pages, repeat=3))
+        results[name] = seconds / pages * 1000
+        print(f"{name:>24}: {results[name]:.3f} ms per page of {MAX_PAGE_SIZE}")
+    orm, fast = results.values()
+    print(f"{'speedup':>24}: {orm / fast:.1f}x")
@@ -5,7 +5,14 @@ from sqlalchemy.sql.schema import Table
 
 from api.dependencies.db import get_db
 from api.database import Base, engine
-from api.models import User, Prospect, Campaign, CampaignProspect, ProspectsFile
+from api.models import (
+    User,
+    Prospect,
+    Campaign,
+    CampaignProspect,
+    ProspectsFile,
+    CampaignAssignment,
+)
 
 
 if __name__ == "__main__":
@@ -14,6 +21,7 @@ if __name__ == "__main__":
 
     if len(args) > 1 and args[1] == "drop":
         ordered_drop: List[Table] = [
+            CampaignAssignment.__table__,
             CampaignProspect.__table__,
             Campaign.__table__,
             Prospect.__table__,
@@ -1,14 +1,10 @@
-import sqlalchemy
-
-from dotenv import dotenv_values
 from fastapi import FastAPI
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.responses import JSONResponse
 
-from api.routers import auth, users, campaigns, prospects, prospects_files
-
+from api.database import async_engine
+from api.routers import auth, users, campaigns, prospects, prospects_files, metrics
 
-config = dotenv_values(".env")
 
 app = FastAPI(
     title="Sales Automation - Python (FastAPI)",
@@ -21,18 +17,30 @@ app.include_router(users.router)
 app.include_router(campaigns.router)
 app.include_router(prospects.router)
 app.include_router(prospects_files.router)
+app.include_router(metrics.router)
 
 
 @app.exception_handler(StarletteHTTPException)
 async def custom_http_exception_handler(_, exc):
-    return JSONResponse({"error": exc.detail}, status_code=exc.status_code)
+    return JSONResponse(
+        {"error": exc.detail},
+        status_code=exc.status_code,
+        headers=getattr(exc, "headers", None),
+    )
+
+
+@app.on_event("shutdown")
+async def close_database_connections():
+    """Close the pooled connections of the async engine, whose drivers may
+    run them on threads of their own
+    """
+    await async_engine.dispose()
 
 
 if __name__ == "__main__":
     import uvicorn
-    from api.database import Base
+    from api.database import Base, engine
 
-    engine = sqlalchemy.create_engine(config.get("DATABASE_URL"))
     Base.metadata.create_all(engine)
 
     uvicorn.run(
@@ -1,6 +1,7 @@
 from sqlalchemy.orm.session import Session
 from api.dependencies.db import get_db
 from api.core.security import get_password_hash
+from api.crud import CampaignCrud, UserCrud
 from api.models import User, Prospect, Campaign, CampaignProspect
 
 
@@ -29,6 +30,9 @@ def seed_data(db: Session):
 
     try:
         db.commit()
+        # The seed rows bypass the Crud classes that maintain the totals
+        UserCrud.reconcile_totals(db)
+        CampaignCrud.reconcile_prospects_counts(db)
     except Exception as e:
         print(e)
 
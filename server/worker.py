@@ -0,0 +1,186 @@
+import os
+import socket
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Set, Tuple, Union
+
+from sqlalchemy.orm.session import Session
+
+from api.core.assignments import assign_prospects
+from api.core.config import settings
+from api.core.exceptions import AssignmentLeaseLost, ImportLeaseLost
+from api.core.uploads import compression_of
+from api.core.utils import write_prospects, write_prospects_parallel
+from api.crud import (
+    CampaignAssignmentCrud,
+    CampaignCrud,
+    ProspectsFileCrud,
+    UserCrud,
+)
+from api.database import SessionLocal, init_process
+
+
+def run_import(file_id: int, worker_id: str):
+    """Run one claimed import in a pool process, with its own session"""
+    db = SessionLocal()
+    try:
+        file = ProspectsFileCrud.get_file_by_id(db, file_id)
+        try:
+            if file.parallel and compression_of(file.saved_file_name) is None:
+                write_prospects_parallel(
+                    db, file, worker_id, settings.IMPORT_RANGE_PROCESSES
+                )
+            else:
+                write_prospects(db, file, worker_id)
+        except ImportLeaseLost:
+            # Another worker owns the import now, its state is theirs
+            db.rollback()
+            raise
+        except Exception:
+            db.rollback()
+            ProspectsFileCrud.update_file_state(db, file_id, "failed", worker_id)
+            raise
+    finally:
+        db.close()
+
+
+def run_assignment(assignment_id: int, worker_id: str):
+    """Run one claimed campaign assignment in a pool process"""
+    db = SessionLocal()
+    try:
+        assignment = CampaignAssignmentCrud.get_by_id(db, assignment_id)
+        try:
+            assign_prospects(db, assignment, worker_id)
+        except AssignmentLeaseLost:
+            # Another worker owns the assignment now, its state is theirs
+            db.rollback()
+            raise
+        except Exception:
+            db.rollback()
+            CampaignAssignmentCrud.update_state(db, assignment_id, "failed", worker_id)
+            raise
+    finally:
+        db.close()
+
+
+def claim_import(db: Session, worker_id: str) -> Union[Tuple[Callable, int], None]:
+    file = ProspectsFileCrud.claim_next_file(
+        db, worker_id, settings.IMPORT_LEASE_SECONDS, settings.IMPORT_MAX_ATTEMPTS
+    )
+    if file is None:
+        return None
+    print(f"...importing file {file.id}")
+    return run_import, file.id
+
+
+def claim_assignment(db: Session, worker_id: str) -> Union[Tuple[Callable, int], None]:
+    assignment = CampaignAssignmentCrud.claim_next_assignment(
+        db, worker_id, settings.IMPORT_LEASE_SECONDS, settings.IMPORT_MAX_ATTEMPTS
+    )
+    if assignment is None:
+        return None
+    print(f"...assigning prospects for assignment {assignment.id}")
+    return run_assignment, assignment.id
+
+
+# Job queues of the worker, each claimed by one of these
+JOB_QUEUES = (claim_import, claim_assignment)
+
+
+def claim_next(
+    db: Session, worker_id: str, turn: int = 0
+) -> Union[Tuple[Callable, int], None]:
+    """Claim the next queued job, trying the queues in turn starting with the
+    [turn]th, so a busy queue can't starve the others. Returns the function
+    running the job and its id.
+    """
+    for i in range(len(JOB_QUEUES)):
+        job = JOB_QUEUES[(turn + i) % len(JOB_QUEUES)](db, worker_id)
+        if job is not None:
+            return job
+    return None
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def requeue_interrupted(db: Session):
+    """Requeue the imports and assignments of dead worker processes on this
+    host, so they resume
+    from their checkpoint right away rather than once their lease expires
+    """
+    host = socket.gethostname()
+    for file in ProspectsFileCrud.get_processing_files(db, f"{host}:"):
+        pid = int(file.claimed_by.rsplit(":", 1)[1])
+        if not pid_alive(pid) and ProspectsFileCrud.requeue_file(db, file.id):
+            print(f"...resuming file {file.id} from row {file.checkpoint_row}")
+    for assignment in CampaignAssignmentCrud.get_processing_assignments(db, f"{host}:"):
+        pid = int(assignment.claimed_by.rsplit(":", 1)[1])
+        if not pid_alive(pid) and CampaignAssignmentCrud.requeue_assignment(
+            db, assignment.id
+        ):
+            print(f"...resuming assignment {assignment.id}")
+
+
+def reconcile_totals(db: Session):
+    """Repair the maintained totals of users and campaigns that drifted from
+    their rows
+    """
+    repaired = UserCrud.reconcile_totals(db)
+    if repaired:
+        print(f"...repaired the totals of {repaired} users")
+    repaired = CampaignCrud.reconcile_prospects_counts(db)
+    if repaired:
+        print(f"...repaired the prospects count of {repaired} campaigns")
+
+
+def report(future: Future):
+    if future.exception():
+        print(f"Job failed: {future.exception()!r}", file=sys.stderr)
+
+
+def run_worker(workers: int):
+    """Claim queued imports and campaign assignments and run up to [workers]
+    of them in parallel
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"-- Import worker {worker_id} running {workers} processes --")
+    db = SessionLocal()
+    requeue_interrupted(db)
+    running: Set[Future] = set()
+    reconciled_at = 0.0
+    turn = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_process) as pool:
+        while True:
+            if time.monotonic() - reconciled_at >= settings.TOTALS_RECONCILE_INTERVAL:
+                reconcile_totals(db)
+                reconciled_at = time.monotonic()
+            running = {f for f in running if not f.done()}
+            job = None
+            if len(running) < workers:
+                job = claim_next(db, worker_id, turn)
+            if job is None:
+                time.sleep(settings.IMPORT_POLL_INTERVAL)
+                continue
+            # Start with the next queue on the next claim
+            turn += 1
+            run, job_id = job
+            future = pool.submit(run, job_id, worker_id)
+            future.add_done_callback(report)
+            running.add(future)
+
+
+if __name__ == "__main__":
+    args = sys.argv
+    if len(args) > 1 and args[1] == "reconcile":
+        reconcile_totals(SessionLocal())
+    else:
+        run_worker(int(args[1]) if len(args) > 1 else settings.IMPORT_WORKERS)